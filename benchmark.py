@@ -0,0 +1,330 @@
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PyQt5.QtWidgets import QApplication, QDialog, QMessageBox, QLineEdit, QDateEdit, QComboBox, QPushButton, QTableView
+from PyQt5.QtCore import QDate
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(HERE, "benchmark_results")
+# Rows per day (and roster size) of one restaurant at today's volume; --scales multiplies them
+BASE_VOLUME = {'sales': 2, 'expenses': 4, 'purchases': 1, 'receivables': 0.2, 'employees': 15}
+HISTORY_DAYS = 730
+# A change is flagged when it is this much slower than the previous run, and by at least REGRESSION_MIN_MS
+REGRESSION_RATIO = 1.2
+REGRESSION_MIN_MS = 1.0
+
+
+def generate_ledger(scale, seed=0):
+    # Synthetic history shaped like the restaurant's: daily cash/card takings, recurring expense categories,
+    # supplier purchases of which about a third are on credit (and so still payable), and a staff roster
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(end=pd.Timestamp.today().normalize(), periods=HISTORY_DAYS, freq='D')
+
+    def dates(per_day):
+        count = int(round(HISTORY_DAYS * per_day * scale))
+        return np.sort(rng.choice(days.to_numpy(), count))
+
+    sale_dates = dates(BASE_VOLUME['sales'])
+    sales = pd.DataFrame({
+        'Date': sale_dates,
+        'Amount': rng.gamma(4.0, 400.0, len(sale_dates)).round(2),
+        'Type': rng.choice(['Cash', 'Credit Card'], len(sale_dates)),
+    })
+
+    expense_dates = dates(BASE_VOLUME['expenses'])
+    expenses = pd.DataFrame({
+        'Date': expense_dates,
+        'Amount': rng.gamma(2.0, 120.0, len(expense_dates)).round(2),
+        'Category': rng.choice(['Rent', 'Utilities', 'Salaries', 'Maintenance', 'Groceries', 'Gas', 'Others'], len(expense_dates)),
+    })
+
+    companies = [f"Supplier {i}" for i in range(max(5, int(20 * scale ** 0.5)))]
+    purchase_dates = dates(BASE_VOLUME['purchases'])
+    purchase_amounts = rng.gamma(3.0, 300.0, len(purchase_dates)).round(2)
+    on_credit = rng.random(len(purchase_dates)) < 0.35
+    purchases = pd.DataFrame({
+        'Date': purchase_dates,
+        'Company': rng.choice(companies, len(purchase_dates)),
+        'Payment Type': np.where(on_credit, 'Credit', 'Cash'),
+        'Amount': purchase_amounts,
+        'Invoice Number': [f"INV{i:07d}" for i in range(len(purchase_dates))],
+        'Remaining Balance': purchase_amounts,
+    })
+    payables = purchases[on_credit].drop(columns='Payment Type').reset_index(drop=True)
+    payables.insert(0, 'ID', [f"{i:032x}" for i in range(len(payables))])
+
+    receivable_dates = dates(BASE_VOLUME['receivables'])
+    receivables = pd.DataFrame({
+        'ID': [f"{i:032x}" for i in range(len(receivable_dates))],
+        'Date': receivable_dates,
+        'Customer': rng.choice([f"Customer {i}" for i in range(50)], len(receivable_dates)),
+        'Amount': rng.gamma(2.0, 200.0, len(receivable_dates)).round(2),
+    })
+
+    staff = int(BASE_VOLUME['employees'] * scale)
+    employees = pd.DataFrame({
+        'ID': [f"{i:032x}" for i in range(staff)],
+        'Name': [f"Employee {i}" for i in range(staff)],
+        'Nationality': rng.choice(['UAE', 'India', 'Pakistan', 'Philippines', 'Egypt'], staff),
+        'Designation': rng.choice(['Cook', 'Waiter', 'Cashier', 'Cleaner', 'Manager'], staff),
+        'Basic Pay': rng.choice([1500.0, 2000.0, 2500.0, 4000.0], staff),
+        'Housing Allowance': rng.choice([0.0, 500.0, 800.0], staff),
+        'Transportation Allowance': rng.choice([0.0, 200.0], staff),
+    })
+
+    months = pd.period_range(end=pd.Timestamp.today(), periods=HISTORY_DAYS // 30, freq='M')
+    advance_count = int(staff * 0.2 * len(months))
+    advanced = rng.integers(0, staff, advance_count)
+    periods = months[rng.integers(0, len(months), advance_count)]
+    advance_salaries = pd.DataFrame({
+        'Filename': [f"advance_{i}.pdf" for i in range(advance_count)],
+        'Employee': employees['Name'].to_numpy()[advanced],
+        'Employee ID': employees['ID'].to_numpy()[advanced],
+        'Creation Date': periods.strftime('%Y-%m-01 09-00-00'),
+        'Year': periods.year,
+        'Month': periods.month,
+        'Advance Salary': rng.choice([200.0, 300.0, 500.0], advance_count),
+    })
+
+    payslips = pd.DataFrame({
+        'Filename': [f"payslip_{i}.pdf" for i in range(staff * 12)],
+        'Employee': np.tile(employees['Name'].to_numpy(), 12),
+        'Employee ID': np.tile(employees['ID'].to_numpy(), 12),
+        'Creation Date': '2024-01-01 09-00-00',
+    })
+
+    return {
+        'employees': employees, 'sales': sales, 'expenses': expenses, 'purchases': purchases,
+        'accounts_payable': payables, 'accounts_receivable': receivables,
+        'payslips': payslips, 'advance_salaries': advance_salaries,
+    }
+
+
+def seed_store(ms, ledger):
+    store = ms.LedgerStore(os.path.join("data", "ledger.db"))
+    with store.unit_of_work():
+        for table, frame in ledger.items():
+            store.replace_table(table, frame)
+    store.close()
+
+
+def drive_dialog(dialog):
+    # Stands in for a user at modal dialogs: pays the first payable by 1 AED, dismisses everything else
+    title = dialog.windowTitle()
+    if title == "Accounts Payable":
+        # The invoice list is the last table, below the vendor summary
+        views = dialog.findChildren(QTableView)
+        if views and views[-1].model().rowCount():
+            views[-1].selectRow(0)
+            click(dialog, "Mark as Paid")
+    elif title == "Mark as Paid":
+        dialog.findChildren(QLineEdit)[0].setText("1")
+        click(dialog, "Confirm Payment")
+    return 0
+
+
+def click(dialog, text):
+    for button in dialog.findChildren(QPushButton):
+        if button.text() == text:
+            button.click()
+            return
+
+
+def line_edit(text):
+    entry = QLineEdit()
+    entry.setText(str(text))
+    return entry
+
+
+def date_edit(day):
+    entry = QDateEdit()
+    entry.setDate(QDate(day.year, day.month, day.day))
+    return entry
+
+
+def combo(items, current):
+    combobox = QComboBox()
+    combobox.addItems(items)
+    combobox.setCurrentText(current)
+    return combobox
+
+
+def wait_for_charts(app, window):
+    # Charts render on a worker; a report is done once its image has been handed back to the GUI thread
+    window.charts.worker.submit(lambda: None).result()
+    app.processEvents()
+
+
+def median_ms(action, repeat, after=None):
+    # after(result) runs untimed once each repeat is measured
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = action()
+        timings.append(time.perf_counter() - started)
+        if after:
+            after(result)
+    return round(statistics.median(timings) * 1000, 2)
+
+
+def run_scale(ms, app, scale, repeat):
+    os.chdir(tempfile.mkdtemp(prefix=f"ms-bench-{scale}x-"))
+    os.makedirs("data", exist_ok=True)
+    # Absolute, so chart renders finishing after this scale still trace into its own directory
+    ms.action_profiler.trace_path = os.path.abspath(os.path.join("data", "actions.jsonl"))
+    ledger = generate_ledger(scale)
+    seed_store(ms, ledger)
+    rows = {table: len(frame) for table, frame in ledger.items()}
+    results = {}
+
+    def open_window():
+        window = ms.YouFish2GoRestaurantCoLLC()
+        for table in ms.TABLE_SCHEMAS:
+            window.ledger_table(table)
+        return window
+
+    def cold_start():
+        ms.shutil.rmtree(os.path.join("data", "cache"), ignore_errors=True)
+        window = open_window()
+        window.save_table_caches()
+        return window
+
+    # A store locks the data directory, so each window's is closed before the next one opens
+    def close_window(window):
+        window.store.close()
+
+    results['startup, cold cache'] = median_ms(cold_start, repeat, close_window)
+    results['startup, warm cache'] = median_ms(open_window, repeat, close_window)
+
+    window = open_window()
+    results['load_all_data'] = median_ms(lambda: [window.load_all_data()] + [window.ledger_table(table) for table in ms.TABLE_SCHEMAS], repeat)
+
+    today = pd.Timestamp.today().normalize()
+    year_ago = today - pd.Timedelta(days=365)
+    dialog = QDialog()
+    employee = window.employees['Name'].iloc[0]
+
+    def employee_combo():
+        combobox = window.create_employee_combobox(dialog)
+        combobox.setCurrentText(employee)
+        return combobox
+
+    cases = {
+        'save_sales': lambda: window.save_sales(dialog, date_edit(today), line_edit(1200), line_edit(800)),
+        'save_sales, back-dated': lambda: window.save_sales(dialog, date_edit(year_ago), line_edit(1200), line_edit(800)),
+        'save_expense': lambda: window.save_expense(dialog, date_edit(today), line_edit(150), combo(["Rent", "Utilities"], "Utilities")),
+        'save_purchase, cash': lambda: window.save_purchase(dialog, date_edit(today), line_edit("Supplier 1"), combo(["Cash", "Credit"], "Cash"), line_edit(300), line_edit("B1")),
+        'save_purchase, credit': lambda: window.save_purchase(dialog, date_edit(today), line_edit("Supplier 2"), combo(["Cash", "Credit"], "Credit"), line_edit(300), line_edit("B2")),
+        'save_employee': lambda: window.save_employee(dialog, line_edit("New Hire"), line_edit("India"), line_edit("Cook"), line_edit(1500), line_edit(0), line_edit(0)),
+        'daily_sales_report': window.daily_sales_report,
+        'daily_expense_report': window.daily_expense_report,
+        'daily_purchase_report': window.daily_purchase_report,
+        'show_employee_list': window.show_employee_list,
+        'profit_loss_statement': window.profit_loss_statement,
+        'create_dashboard': window.create_dashboard,
+        'list_generated_payslips': window.list_generated_payslips,
+        'list_generated_advance_salaries': window.list_generated_advance_salaries,
+        'list_accounts_receivable': window.list_accounts_receivable,
+        'mark_as_paid (list_accounts_payable)': window.list_accounts_payable,
+    }
+    for report in ('sales', 'expense', 'profit_loss'):
+        def run_report(report=report):
+            # Cleared each time so the render itself is measured, not a cache hit
+            window.charts.clear()
+            getattr(window, f"generate_{report}_report")(dialog, date_edit(year_ago), date_edit(today))
+            wait_for_charts(app, window)
+        cases[f"generate_{report}_report"] = run_report
+    cases['generate_slip'] = lambda: window.generate_slip(dialog, employee_combo(), line_edit(today.year), line_edit(today.month), line_edit(""), line_edit(""))
+    cases['generate_advance_slip'] = lambda: window.generate_advance_slip(dialog, employee_combo(), line_edit(250), line_edit(today.year), line_edit(today.month))
+
+    for name, action in cases.items():
+        results[name] = median_ms(action, repeat)
+    # Renders a slip per employee, so it runs once
+    results['run_payroll'] = median_ms(lambda: window.run_payroll(dialog, line_edit(today.year), line_edit(today.month)), 1)
+    window.store.close()
+    return {'rows': rows, 'timings': results}
+
+
+def run(scales, repeat):
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    QDialog.exec_ = drive_dialog
+    for name in ("information", "warning", "critical"):
+        setattr(QMessageBox, name, staticmethod(lambda *args, **kwargs: QMessageBox.Ok))
+    cwd = os.getcwd()
+    os.chdir(tempfile.mkdtemp(prefix="ms-bench-"))
+    sys.path.insert(0, HERE)
+    import ms
+    report = {'started': datetime.now().isoformat(timespec='seconds'), 'python': sys.version.split()[0], 'pandas': pd.__version__, 'repeat': repeat, 'scales': {}}
+    try:
+        for scale in scales:
+            print(f"Running {scale}x ...", flush=True)
+            report['scales'][f"{scale}x"] = run_scale(ms, app, scale, repeat)
+    finally:
+        os.chdir(cwd)
+    return report
+
+
+def save_report(report, results_dir):
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"{report['started'].replace(':', '')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+    return path
+
+
+def compare(reports, names):
+    # One row per (scale, case), one column per run in ms; the last column is the change from the previous run
+    rows = []
+    for scale in dict.fromkeys(scale for report in reports for scale in report['scales']):
+        cases = dict.fromkeys(case for report in reports for case in report['scales'].get(scale, {}).get('timings', {}))
+        for case in cases:
+            values = [report['scales'].get(scale, {}).get('timings', {}).get(case) for report in reports]
+            change = ''
+            if len(values) > 1 and values[-1] is not None and values[-2]:
+                change = f"{(values[-1] / values[-2] - 1) * 100:+.0f}%"
+                if values[-1] > values[-2] * REGRESSION_RATIO and values[-1] - values[-2] >= REGRESSION_MIN_MS:
+                    change += " REGRESSION"
+            rows.append([scale, case] + ['' if value is None else f"{value:.2f}" for value in values] + [change])
+    header = ['scale', 'case'] + names + ['change']
+    widths = [max(len(str(row[i])) for row in rows + [header]) for i in range(len(header))]
+    lines = ["  ".join(str(cell).ljust(width) if i < 2 else str(cell).rjust(width) for i, (cell, width) in enumerate(zip(row, widths))) for row in [header] + rows]
+    lines.insert(1, "  ".join('-' * width for width in widths))
+    return "\n".join(lines)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="benchmark.py", description="Time the ledger paths of ms.py on synthetic data at several volumes.")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100], help="multiples of today's volume (default: 1 10 100)")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per case; the median is reported")
+    parser.add_argument('--results-dir', default=RESULTS_DIR)
+    parser.add_argument('--last', type=int, default=4, help="earlier runs to show next to this one")
+    parser.add_argument('--compare', nargs='+', metavar="RESULT", help="only print the comparison of these result files")
+    args = parser.parse_args(argv[1:])
+
+    if args.compare:
+        paths = args.compare
+    else:
+        path = save_report(run(args.scales, args.repeat), args.results_dir)
+        print(f"Saved {path}")
+        paths = sorted(glob.glob(os.path.join(args.results_dir, "*.json")))[-(args.last + 1):]
+    reports = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            reports.append(json.load(f))
+    print(compare(reports, [os.path.splitext(os.path.basename(path))[0] for path in paths]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
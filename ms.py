@@ -1,44 +1,1455 @@
+import argparse
+import copy
+import cProfile
+import functools
+import inspect
+import io
+import json
 import os
+import pstats
+import shutil
+import socket
+import socketserver
 import sys
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+
+# (stage, perf_counter) marks for --profile-startup
+STARTUP_TIMES = [('start', time.perf_counter())]
+
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
+STARTUP_TIMES.append(('import pandas', time.perf_counter()))
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QMenuBar, QMenu, QAction, QWidget, QVBoxLayout,
-    QDialog, QLabel, QLineEdit, QPushButton, QFormLayout, QMessageBox, QTableWidget,
-    QTableWidgetItem, QDateEdit, QComboBox, QDialogButtonBox, QGridLayout, QHBoxLayout
+    QDialog, QLabel, QLineEdit, QPushButton, QFormLayout, QMessageBox, QTableView,
+    QDateEdit, QComboBox, QDialogButtonBox, QGridLayout, QHBoxLayout
 )
-from PyQt5.QtCore import QDate, Qt
-from fpdf import FPDF
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from PyQt5.QtCore import QDate, Qt, QAbstractTableModel, QModelIndex, QObject, QTimer, pyqtSignal
+from PyQt5.QtGui import QPixmap
+STARTUP_TIMES.append(('import PyQt5', time.perf_counter()))
+# fpdf, matplotlib and openpyxl are imported where first used (slips, charts, Excel files) to keep launch fast
 
 # Ensure data directory exists
 os.makedirs("data", exist_ok=True)
 
-class YouFish2GoRestaurantCoLLC(QMainWindow):
+# Column kinds per table: 'date' -> datetime64, 'money' -> float64, 'int' -> int64, 'category' -> categorical, 'text' -> stripped str
+TABLE_SCHEMAS = {
+    'employees': {'ID': 'text', 'Name': 'text', 'Nationality': 'category', 'Designation': 'category', 'Basic Pay': 'money', 'Housing Allowance': 'money', 'Transportation Allowance': 'money'},
+    'sales': {'Date': 'date', 'Amount': 'money', 'Type': 'category'},
+    'expenses': {'Date': 'date', 'Amount': 'money', 'Category': 'category'},
+    'purchases': {'Date': 'date', 'Company': 'category', 'Payment Type': 'category', 'Amount': 'money', 'Invoice Number': 'text', 'Remaining Balance': 'money'},
+    'accounts_payable': {'ID': 'text', 'Date': 'date', 'Company': 'category', 'Amount': 'money', 'Invoice Number': 'text', 'Remaining Balance': 'money'},
+    'accounts_receivable': {'ID': 'text', 'Date': 'date', 'Customer': 'category', 'Amount': 'money'},
+    'payable_payments': {'ID': 'text', 'Date': 'date', 'Payable ID': 'text', 'Company': 'category', 'Invoice Number': 'text', 'Amount': 'money'},
+    'payslips': {'Filename': 'text', 'Employee': 'text', 'Employee ID': 'text', 'Creation Date': 'text'},
+    'advance_salaries': {'Filename': 'text', 'Employee': 'text', 'Employee ID': 'text', 'Creation Date': 'text', 'Year': 'int', 'Month': 'int', 'Advance Salary': 'money'},
+}
+RECORD_TABLES = ('payslips',)
+# Columns added to a table after it was first saved; older data gets them empty and is rewritten once
+LATER_COLUMNS = {'advance_salaries': ['Employee ID', 'Year', 'Month', 'Advance Salary'], 'payslips': ['Employee ID']}
+# Tables whose rows carry a stable primary key; the frame is indexed by it
+KEY_COLUMNS = {'employees': 'ID', 'accounts_payable': 'ID', 'accounts_receivable': 'ID', 'payable_payments': 'ID'}
+# Breakdown column of the daily/monthly rollups kept for reporting
+ROLLUP_KEYS = {'sales': 'Type', 'expenses': 'Category'}
+
+# Payables aging: (label, oldest invoice age in days); the last bucket takes everything older, and undated invoices
+AGING_BUCKETS = [('0-30', 30), ('31-60', 60), ('61-90', 90), ('90+', None)]
+
+# Dated history tables held as per-month partitions (see PartitionedTable): the newest HOT_MONTHS stay loaded, and
+# of the older months read in for reports at most COLD_MONTHS are kept, least recently used dropped first
+PARTITIONED_TABLES = ('sales', 'expenses', 'purchases')
+HOT_MONTHS = 2
+COLD_MONTHS = 6
+
+
+def coerce_column(series, kind):
+    if kind == 'date':
+        return pd.to_datetime(series, errors='coerce', format='ISO8601')
+    if kind == 'money':
+        return pd.to_numeric(series, errors='coerce').fillna(0.0).astype('float64')
+    if kind == 'int':
+        return pd.to_numeric(series, errors='coerce').fillna(0).astype('int64')
+    if kind == 'category':
+        return series.astype('category')
+    return series.fillna('').astype(str).str.strip()
+
+
+def apply_schema(df, df_name):
+    df = df.copy()
+    for column, kind in TABLE_SCHEMAS[df_name].items():
+        df[column] = coerce_column(df[column], kind)
+    return df
+
+
+def sort_by_date(df):
+    # Tables with a Date column are kept in date order so range lookups can binary search
+    if 'Date' in df.columns and not df['Date'].is_monotonic_increasing:
+        df = df.sort_values('Date', kind='stable', ignore_index=True)
+    return df
+
+
+def rows_between(df, start_date, end_date):
+    dates = df['Date']
+    start = dates.searchsorted(start_date, side='left')
+    end = dates.searchsorted(end_date + pd.Timedelta(days=1), side='left')
+    action_profiler.count(rows=end - start)
+    return df.iloc[start:end]
+
+
+def insert_sorted(df_name, df, new_rows):
+    new_rows = sort_by_date(new_rows)
+    if 'Date' in df.columns and len(df) and len(new_rows):
+        # Undated rows sort last, so new dated rows go in ahead of them
+        dated = len(df) - int(df['Date'].isna().sum())
+        if dated and new_rows['Date'].iloc[0] < df['Date'].iloc[dated - 1]:
+            # Back-dated entry: merge it into place instead of appending
+            return set_key_index(df_name, sort_by_date(concat_typed(df_name, [df, new_rows])))
+        if dated < len(df):
+            return set_key_index(df_name, concat_typed(df_name, [df.iloc[:dated], new_rows, df.iloc[dated:]]))
+    return set_key_index(df_name, concat_typed(df_name, [df, new_rows]))
+
+
+def new_key():
+    return uuid.uuid4().hex
+
+
+def set_key_index(df_name, df):
+    # Index keyed tables by their ID so a row is found through the index hash table, not a column scan
+    if df_name in KEY_COLUMNS:
+        df = df.set_axis(pd.Index(df[KEY_COLUMNS[df_name]].to_numpy(), name=None))
+    return df
+
+
+def concat_typed(df_name, frames):
+    # Categoricals with differing categories fall back to object dtype in pd.concat; re-pin them
+    df = pd.concat(frames, ignore_index=True)
+    for column, kind in TABLE_SCHEMAS[df_name].items():
+        if kind == 'category' and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    return df
+
+
+class Rollup:
+    # Amount sums per day and per month, broken down by a key column
+    def __init__(self):
+        self.daily = {}
+        self.monthly = {}
+
+    @classmethod
+    def from_frame(cls, df, key_column):
+        rollup = cls()
+        rollup.add_frame(df, key_column)
+        return rollup
+
+    def add_frame(self, df, key_column):
+        dated = df[df['Date'].notna()]
+        grouped = dated.groupby([dated['Date'].dt.normalize(), key_column], observed=True)['Amount'].sum()
+        for (day, key), amount in grouped.items():
+            self.add(day, key, amount)
+
+    def add(self, day, key, amount):
+        if pd.isna(day):
+            return
+        day = pd.Timestamp(day).date()
+        for buckets, period in ((self.daily, day), (self.monthly, (day.year, day.month))):
+            amounts = buckets.setdefault(period, {})
+            amounts[key] = amounts.get(key, 0.0) + float(amount)
+
+    def between(self, start_date, end_date):
+        # Whole months come from the monthly buckets and only the partial months at either end from daily ones
+        start_date, end_date = pd.Timestamp(start_date).date(), pd.Timestamp(end_date).date()
+        totals = {}
+        day = start_date
+        while day <= end_date:
+            next_month = (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+            if day.day == 1 and next_month - timedelta(days=1) <= end_date:
+                amounts = self.monthly.get((day.year, day.month), {})
+                day = next_month
+            else:
+                amounts = self.daily.get(day, {})
+                day += timedelta(days=1)
+            for key, amount in amounts.items():
+                totals[key] = totals.get(key, 0.0) + amount
+        return totals
+
+
+def aging_bucket(day, as_of):
+    if day is None:
+        return len(AGING_BUCKETS) - 1
+    age = (as_of - day).days
+    for index, (label, oldest) in enumerate(AGING_BUCKETS):
+        if oldest is None or age <= oldest:
+            return index
+
+
+class VendorLedger:
+    # Open payables per company: the running balance, and the balance by invoice date that aging is read from.
+    # Kept current by every invoice, payment and adjustment. Aging for a day is worked out once and then
+    # adjusted in place by later changes, so it is only recomputed when the date rolls over.
+    def __init__(self):
+        self.balances = {}
+        self.by_date = {}
+        self.aged = None
+
+    @classmethod
+    def from_frame(cls, df):
+        ledger = cls()
+        grouped = df.groupby(['Company', df['Date'].dt.normalize()], observed=True, dropna=False)['Remaining Balance'].sum()
+        for (company, day), amount in grouped.items():
+            ledger.add(company, day, amount)
+        return ledger
+
+    def add(self, company, day, amount):
+        day = None if pd.isna(day) else pd.Timestamp(day).normalize()
+        amount = float(amount)
+        self.balances[company] = self.balances.get(company, 0.0) + amount
+        dates = self.by_date.setdefault(company, {})
+        dates[day] = dates.get(day, 0.0) + amount
+        if abs(dates[day]) < 0.005:
+            del dates[day]
+        if self.aged is not None:
+            as_of, buckets = self.aged
+            buckets.setdefault(company, [0.0] * len(AGING_BUCKETS))[aging_bucket(day, as_of)] += amount
+
+    def aging(self, as_of):
+        # {company: [amount per AGING_BUCKETS bucket]}
+        if self.aged is None or self.aged[0] != as_of:
+            buckets = {}
+            for company, dates in self.by_date.items():
+                row = buckets[company] = [0.0] * len(AGING_BUCKETS)
+                for day, amount in dates.items():
+                    row[aging_bucket(day, as_of)] += amount
+            self.aged = (as_of, buckets)
+        return self.aged[1]
+
+
+def sql_type(series):
+    if pd.api.types.is_float_dtype(series):
+        return "REAL"
+    if pd.api.types.is_integer_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return "INTEGER"
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "TIMESTAMP"
+    return "TEXT"
+
+
+def sql_payload(dataframe):
+    # Column names, SQL types and plain rows: what a write needs, in a form the journal can hold
+    return [str(column) for column in dataframe.columns], [sql_type(dataframe[column]) for column in dataframe.columns], sql_rows(dataframe)
+
+
+def sql_rows(dataframe):
+    # Plain Python values for sqlite3: timestamps as ISO text (as DataFrame.to_sql writes them), NaN/NaT as NULL
+    frame = dataframe.copy()
+    for column in frame.columns:
+        if pd.api.types.is_datetime64_any_dtype(frame[column]):
+            frame[column] = frame[column].dt.strftime('%Y-%m-%d %H:%M:%S')
+    frame = frame.astype(object)
+    return [list(row) for row in frame.where(frame.notna(), None).itertuples(index=False, name=None)]
+
+
+def atomic_write(path, write):
+    # write(temp_path) fills a sibling temp file, which is fsynced and renamed over path, so a crash
+    # leaves either the old file or the new one, never a partial one
+    root, ext = os.path.splitext(path)
+    temp_path = f"{root}.tmp{ext}"
+    try:
+        write(temp_path)
+        with open(temp_path, 'r+b') as f:
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        action_profiler.count(written=os.path.getsize(path))
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+EXPORT_CHUNK_SIZE = 10000
+
+
+def table_query(name, start=None, end=None, after=None, limit=None):
+    # SELECT for a table, limited to Dates from start through end (inclusive) for dated tables, in Date order, else
+    # in rowid order. A page of limit rows also selects "_rowid" and starts after the cursor of the previous page
+    # (its last [Date, rowid], or [rowid]), so rows written between pages cannot shift it.
+    dated = 'Date' in TABLE_SCHEMAS.get(name, {})
+    columns = 'rowid AS "_rowid", *' if limit is not None else '*'
+    query, params, conditions = f'SELECT {columns} FROM "{name}"', [], []
+    if dated:
+        # Dates are stored as ISO text, so they compare correctly as strings
+        if start is not None:
+            conditions.append('"Date" >= ?')
+            params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+        if end is not None:
+            conditions.append('"Date" < ?')
+            params.append((pd.Timestamp(end).normalize() + timedelta(days=1)).strftime('%Y-%m-%d'))
+    if after is not None:
+        if not dated:
+            conditions.append('rowid > ?')
+            params.append(after[0])
+        elif after[0] is None:
+            # Undated rows sort first
+            conditions.append('("Date" IS NULL AND rowid > ? OR "Date" IS NOT NULL)')
+            params.append(after[1])
+        else:
+            conditions.append('("Date" > ? OR "Date" = ? AND rowid > ?)')
+            params += [after[0], after[0], after[1]]
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY "Date", rowid' if dated else ' ORDER BY rowid'
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+    return query, params
+
+
+# Write operations a store accepts; each names a write_* method of LedgerStore
+STORE_OPS = ('replace_table', 'append_rows', 'ensure_index', 'update_value', 'delete_rows')
+SQL_TYPES = ('REAL', 'INTEGER', 'TIMESTAMP', 'TEXT')
+# Python types sqlite3 can bind as a value
+SQL_VALUE_TYPES = (type(None), bool, int, float, str)
+
+
+def check_store_op(name, op, args):
+    # Table, column and type names are quoted into SQL as they are, so ops from a terminal may only name the
+    # ledger's own tables and their schema columns
+    if op not in STORE_OPS:
+        raise ValueError(f"Unknown write operation: {op}")
+    if name not in TABLE_SCHEMAS or not args or args[0] != name:
+        raise ValueError(f"Unknown table: {name}")
+    if op in ('replace_table', 'append_rows'):
+        name, columns, types, rows = args
+        if (not isinstance(columns, list) or not isinstance(types, list) or not isinstance(rows, list)
+                or len(types) != len(columns) or any(kind not in SQL_TYPES for kind in types)
+                or any(not isinstance(row, list) or len(row) != len(columns) for row in rows)):
+            raise ValueError(f"Malformed rows for {name}")
+        values = [value for row in rows for value in row]
+    elif op == 'ensure_index':
+        name, column, unique = args
+        columns, values = [column], []
+        if not isinstance(unique, bool):
+            raise ValueError(f"Malformed index for {name}")
+    elif op == 'update_value':
+        name, key_column, key, column, value = args
+        columns, values = [key_column, column], [key, value]
+    else:
+        name, key_column, keys = args
+        if not isinstance(keys, list):
+            raise ValueError(f"Malformed keys for {name}")
+        columns, values = [key_column], keys
+    if any(not isinstance(value, SQL_VALUE_TYPES) or isinstance(value, int) and not -2**63 <= value < 2**63 for value in values):
+        raise ValueError(f"Unsupported value in write to {name}")
+    unknown = [column for column in columns if not isinstance(column, str) or column not in TABLE_SCHEMAS[name]]
+    if unknown:
+        raise ValueError(f"Unknown column(s) in {name}: {', '.join(map(str, unknown))}")
+
+
+class LedgerLocked(RuntimeError):
+    pass
+
+
+def lock_data_dir(directory):
+    # Held for as long as a store is open, so a second process cannot append to and truncate the same journal;
+    # the OS releases it if the process dies
+    lock_file = open(os.path.join(directory, "ledger.lock"), 'a')
+    try:
+        if os.name == 'nt':
+            import msvcrt
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        raise LedgerLocked(
+            f"The ledger in {os.path.abspath(directory)} is in use by another process (the till or a ledger server). "
+            "Close it, or run 'ms.py serve' and pass --server HOST:PORT."
+        ) from None
+    return lock_file
+
+
+class LedgerWrites:
+    # The write API shared by LedgerStore and LedgerClient; each write becomes an (op, args) pair for enqueue
+    def replace_table(self, name, dataframe):
+        action_profiler.count(rows=len(dataframe))
+        self.enqueue(name, 'replace_table', name, *sql_payload(dataframe), supersedes=True)
+
+    def append_rows(self, name, rows):
+        # Inserting rows only touches the new records, not the table history
+        if len(rows):
+            action_profiler.count(rows=len(rows))
+            self.enqueue(name, 'append_rows', name, *sql_payload(pd.DataFrame(rows)))
+
+    def ensure_index(self, name, column, unique=True):
+        self.enqueue(name, 'ensure_index', name, column, unique)
+
+    def update_value(self, name, key_column, key, column, value):
+        value = value.item() if hasattr(value, 'item') else value
+        action_profiler.count(rows=1)
+        self.enqueue(name, 'update_value', name, key_column, key, column, value)
+
+    def delete_rows(self, name, key_column, keys):
+        keys = list(keys)
+        action_profiler.count(rows=len(keys))
+        self.enqueue(name, 'delete_rows', name, key_column, keys)
+
+
+class LedgerStore(LedgerWrites):
+    # SQLite-backed storage for the ledger tables; one SQL table per former .xlsx workbook.
+    # Every write is appended to a write-ahead journal (fsynced) when it is made, then queued per dirty
+    # table and committed together in one transaction on a single writer thread; reads wait for the queue.
+    # The commit records the last journal sequence it applied, and replay_journal() re-applies anything
+    # newer after a crash, so commits can be batched without risking the writes in between. One store
+    # owns a data directory at a time; opening a second raises LedgerLocked.
+    def __init__(self, path, commit_delay=2.0):
+        self.lock_file = lock_data_dir(os.path.dirname(path))
+        self.path = path
+        self.cache_dir = os.path.join(os.path.dirname(path), "cache")
+        self.journal_path = os.path.join(os.path.dirname(path), "journal.wal")
+        # Autocommit mode: transactions are opened explicitly so a batch can include DDL
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn_lock = threading.Lock()
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.batch_depth = 0
+        self.commit_delay = commit_delay
+        self.commit_timer = None
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ledger-writer")
+        self.on_status = None
+        self.on_error = None
+        with self.conn_lock:
+            self.conn.execute("PRAGMA journal_mode = WAL")
+            self.conn.execute("PRAGMA synchronous = FULL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS _versions (name TEXT PRIMARY KEY, version TEXT NOT NULL)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS _journal (db_id TEXT NOT NULL, last_seq INTEGER NOT NULL)")
+            row = self.conn.execute("SELECT db_id FROM _journal").fetchone()
+            if row is None:
+                row = (uuid.uuid4().hex,)
+                self.conn.execute("INSERT INTO _journal (db_id, last_seq) VALUES (?, 0)", row)
+        # Journal records carry the database id, so a journal is never replayed onto a different or recreated database
+        self.db_id = row[0]
+        self.trim_journal()
+        self.seq = max([self.applied_seq()] + [record['seq'] for record in self.read_journal()])
+        self.journal = open(self.journal_path, 'a', encoding='utf-8')
+
+    def close(self):
+        self.flush()
+        self.writer.shutdown()
+        self.journal.close()
+        with self.conn_lock:
+            self.conn.close()
+        self.lock_file.close()
+
+    def applied_seq(self):
+        with self.conn_lock:
+            return self.conn.execute("SELECT last_seq FROM _journal").fetchone()[0]
+
+    def read_journal(self):
+        records = []
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-append; its write was never acknowledged
+                        break
+                    if record.get('db') == self.db_id:
+                        records.append(record)
+        return records
+
+    def trim_journal(self):
+        # Cuts a torn last line left by a crash mid-append (its write was never acknowledged), so the next record
+        # written does not start on the end of it
+        if not os.path.exists(self.journal_path):
+            return
+        end = 0
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                try:
+                    json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                end += len(line)
+        if end < os.path.getsize(self.journal_path):
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(end)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def replay_journal(self):
+        self.flush()
+        applied = self.applied_seq()
+        records = [record for record in self.read_journal() if record['seq'] > applied]
+        if records:
+            # Committed like any other batch, so a record that cannot be applied is set aside the same way
+            self.requeue([(r['seq'], r['op'], r['args']) for r in records])
+            self.flush()
+        return len(records)
+
+    def requeue(self, ops):
+        # The ops were not applied: put them ahead of anything queued since, so the journal is not truncated and
+        # last_seq does not move past them until they are
+        with self.pending_lock:
+            requeued = {}
+            for seq, op, args in ops:
+                requeued.setdefault(args[0], []).append((seq, op, args))
+            for name, queued in self.pending.items():
+                requeued.setdefault(name, []).extend(queued)
+            self.pending = requeued
+
+    def truncate_journal(self):
+        with self.pending_lock:
+            if not self.pending:
+                self.journal.truncate(0)
+                self.journal.flush()
+                os.fsync(self.journal.fileno())
+
+    @contextmanager
+    def unit_of_work(self):
+        # Writes made inside the block are committed in the same transaction
+        with self.pending_lock:
+            self.batch_depth += 1
+        try:
+            yield
+        finally:
+            with self.pending_lock:
+                self.batch_depth -= 1
+            self.schedule_commit()
+
+    def enqueue(self, name, op, *args, supersedes=False):
+        # op names a write_* method; args must be JSON-serializable so the write can be journaled
+        with self.pending_lock:
+            self.seq += 1
+            line = json.dumps({'db': self.db_id, 'seq': self.seq, 'op': op, 'args': args}, default=str) + "\n"
+            self.journal.write(line)
+            action_profiler.count(written=len(line))
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+            ops = self.pending.setdefault(name, [])
+            if supersedes:
+                # A full snapshot of the table makes anything still queued for it redundant
+                ops.clear()
+            ops.append((self.seq, op, args))
+        self.schedule_commit()
+        self.report_status()
+
+    def schedule_commit(self):
+        # The first write opens a short window; everything written before it closes shares one commit
+        with self.pending_lock:
+            if self.batch_depth or self.commit_timer or not self.pending:
+                return
+            self.commit_timer = threading.Timer(self.commit_delay, lambda: self.writer.submit(self.commit_pending))
+            self.commit_timer.daemon = True
+            self.commit_timer.start()
+
+    def commit_pending(self):
+        with self.pending_lock:
+            if self.commit_timer:
+                self.commit_timer.cancel()
+                self.commit_timer = None
+            if self.batch_depth:
+                return
+            batch, self.pending = self.pending, {}
+        if batch:
+            ops = [op for ops in batch.values() for op in ops]
+            try:
+                self.apply_batch(ops)
+            except Exception:
+                self.apply_singly(ops)
+            self.truncate_journal()
+        self.report_status()
+
+    def apply_singly(self, ops):
+        # After a batch fails, each op is committed on its own in journal order, so a write that can never apply
+        # does not hold back the rest: it is moved to journal.wal.failed. If the database was only busy, the op
+        # and everything after it are retried with the next commit.
+        ops = sorted(ops, key=lambda op: op[0])
+        for i, (seq, op, args) in enumerate(ops):
+            try:
+                self.apply_batch([(seq, op, args)])
+            except Exception as e:
+                if isinstance(e, sqlite3.OperationalError) and (getattr(e, 'sqlite_errorcode', 0) & 0xff) in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED):
+                    self.requeue(ops[i:])
+                    self.report_error(f"Saving {args[0]} failed, will retry: {e}")
+                    return
+                with open(self.journal_path + ".failed", 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'db': self.db_id, 'seq': seq, 'op': op, 'args': args, 'error': str(e)}, default=str) + "\n")
+                self.report_error(f"Saving {args[0]} failed; the write was set aside in {self.journal_path}.failed: {e}")
+
+    def report_error(self, message):
+        if self.on_error:
+            self.on_error(message)
+        else:
+            print(message)
+
+    def apply_batch(self, ops):
+        # Runs on the writer thread; the journal position is recorded in the same transaction as the data
+        with self.conn_lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for seq, op, args in ops:
+                    getattr(self, f"write_{op}")(*args)
+                self.conn.execute("UPDATE _journal SET last_seq = ?", (max(seq for seq, op, args in ops),))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def flush(self):
+        # Commit whatever is dirty now; the writer is a single FIFO thread, so earlier commits are done too
+        self.writer.submit(self.commit_pending).result()
+
+    def dirty_tables(self):
+        with self.pending_lock:
+            return sorted(self.pending)
+
+    def pending_count(self):
+        with self.pending_lock:
+            return sum(len(ops) for ops in self.pending.values())
+
+    def report_status(self):
+        if self.on_status:
+            self.on_status(self.pending_count())
+
+    def table_version(self, name):
+        self.flush()
+        with self.conn_lock:
+            row = self.conn.execute("SELECT version FROM _versions WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def bump_version(self, name):
+        # Bumped before the data write so a crash in between can only cause a cache miss. Versions are
+        # random stamps so a cache never matches a different or recreated database.
+        self.conn.execute(
+            "INSERT INTO _versions (name, version) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET version = excluded.version",
+            (name, uuid.uuid4().hex)
+        )
+
+    def load_cache(self, name, schema, suffix=''):
+        # suffix names another cache kept against the same table version (e.g. '.aggregates')
+        cache_path = os.path.join(self.cache_dir, f"{name}{suffix}.pkl")
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            cached = pd.read_pickle(cache_path)
+        except Exception as e:
+            print(f"Ignoring unreadable cache for {name}: {e}")
+            return None
+        version = self.table_version(name)
+        if version is None or cached.get('version') != version or cached.get('schema') != schema:
+            return None
+        return cached['frame']
+
+    def save_cache(self, name, frame, schema, suffix=''):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cached = {'version': self.table_version(name), 'schema': schema, 'frame': frame}
+        atomic_write(os.path.join(self.cache_dir, f"{name}{suffix}.pkl"), lambda temp_path: pd.to_pickle(cached, temp_path))
+
+    def has_table(self, name):
+        self.flush()
+        with self.conn_lock:
+            return self.table_exists(name)
+
+    def table_exists(self, name):
+        cursor = self.conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,))
+        return cursor.fetchone() is not None
+
+    def read_table(self, name, start=None, end=None):
+        self.flush()
+        query, params = table_query(name, start, end)
+        with self.conn_lock:
+            return pd.read_sql(query, self.conn, params=params)
+
+    def read_page(self, name, start=None, end=None, after=None, limit=EXPORT_CHUNK_SIZE):
+        # The next page in table_query order and the cursor to pass for the one after it
+        self.flush()
+        query, params = table_query(name, start, end, after, limit)
+        with self.conn_lock:
+            page = pd.read_sql(query, self.conn, params=params)
+        if len(page):
+            last = page.iloc[-1]
+            after = [int(last['_rowid'])]
+            if 'Date' in TABLE_SCHEMAS.get(name, {}):
+                after.insert(0, None if pd.isna(last['Date']) else last['Date'])
+        return page.drop(columns='_rowid'), after
+
+    def read_chunks(self, name, start=None, end=None, chunksize=EXPORT_CHUNK_SIZE):
+        # Streams the table on a connection of its own; in WAL mode the reader does not hold up commits
+        self.flush()
+        query, params = table_query(name, start, end)
+        conn = sqlite3.connect(self.path)
+        try:
+            yield from pd.read_sql(query, conn, params=params, chunksize=chunksize)
+        finally:
+            conn.close()
+
+    # The write_* methods run on the writer thread inside the batch transaction. They use plain SQL
+    # rather than DataFrame.to_sql, which commits on its own and would split the batch.
+    def write_replace_table(self, name, columns, types, rows):
+        self.bump_version(name)
+        self.conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+        self.write_append_rows(name, columns, types, rows, bump=False)
+
+    def write_append_rows(self, name, columns, types, rows, bump=True):
+        if bump:
+            self.bump_version(name)
+        definitions = ', '.join(f'"{column}" {kind}' for column, kind in zip(columns, types))
+        self.conn.execute(f'CREATE TABLE IF NOT EXISTS "{name}" ({definitions})')
+        placeholders = ', '.join('?' for _ in columns)
+        column_names = ', '.join(f'"{column}"' for column in columns)
+        self.conn.executemany(f'INSERT INTO "{name}" ({column_names}) VALUES ({placeholders})', rows)
+
+    def write_ensure_index(self, name, column, unique=True):
+        if self.table_exists(name):
+            self.conn.execute(f'CREATE {"UNIQUE " if unique else ""}INDEX IF NOT EXISTS "ix_{name}_{column}" ON "{name}" ("{column}")')
+
+    def write_update_value(self, name, key_column, key, column, value):
+        self.bump_version(name)
+        self.conn.execute(f'UPDATE "{name}" SET "{column}" = ? WHERE "{key_column}" = ?', (value, key))
+
+    def write_delete_rows(self, name, key_column, keys):
+        self.bump_version(name)
+        self.conn.executemany(f'DELETE FROM "{name}" WHERE "{key_column}" = ?', [(key,) for key in keys])
+
+
+
+def send_message(wfile, message):
+    wfile.write((json.dumps(message, default=str) + "\n").encode('utf-8'))
+    wfile.flush()
+
+
+class LedgerServer(socketserver.ThreadingTCPServer):
+    # Owns the ledger store for every terminal. Writes from all connections go through the one store, so
+    # they are serialized in a single journal and commit queue, and each accepted batch is pushed to the
+    # other connected terminals. Protocol: one JSON object per line; replies echo the request's "id".
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, store, address):
+        super().__init__(address, LedgerRequestHandler)
+        self.store = store
+        self.clients = set()
+        self.clients_lock = threading.Lock()
+        self.write_lock = threading.Lock()
+
+    def dispatch(self, request, origin):
+        kind = request.get('type')
+        if kind in ('read', 'has_table', 'version') and request.get('table') not in TABLE_SCHEMAS:
+            raise ValueError(f"Unknown table: {request.get('table')}")
+        # Reads also take the write lock, so they never run while a batch is half queued, and the store seq
+        # they report covers exactly the batches already broadcast
+        if kind == 'read':
+            with self.write_lock:
+                if request.get('limit') is None:
+                    table, after = self.store.read_table(request['table'], request.get('start'), request.get('end')), None
+                else:
+                    table, after = self.store.read_page(request['table'], request.get('start'), request.get('end'), request.get('after'), request['limit'])
+                seq = self.store.seq
+            columns, types, rows = sql_payload(table)
+            return {'columns': columns, 'rows': rows, 'seq': seq, 'after': after}
+        if kind == 'has_table':
+            with self.write_lock:
+                return {'result': self.store.has_table(request['table'])}
+        if kind == 'version':
+            with self.write_lock:
+                return {'result': self.store.table_version(request['table'])}
+        if kind == 'write':
+            ops = request['ops']
+            for name, op, args in ops:
+                check_store_op(name, op, args)
+            # Held across the broadcast so every terminal sees batches in the order the store applied them
+            with self.write_lock:
+                with self.store.unit_of_work():
+                    for name, op, args in ops:
+                        self.store.enqueue(name, op, *args, supersedes=op == 'replace_table')
+                self.broadcast({'type': 'ops', 'ops': ops, 'seq': self.store.seq}, origin)
+            return {'result': True}
+        raise ValueError(f"Unknown request type: {kind}")
+
+    def broadcast(self, message, origin):
+        with self.clients_lock:
+            clients = [client for client in self.clients if client is not origin]
+        for client in clients:
+            client.send(message)
+
+
+class LedgerRequestHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.send_lock = threading.Lock()
+        with self.server.clients_lock:
+            self.server.clients.add(self)
+
+    def finish(self):
+        with self.server.clients_lock:
+            self.server.clients.discard(self)
+        super().finish()
+
+    def send(self, message):
+        with self.send_lock:
+            try:
+                send_message(self.wfile, message)
+            except OSError:
+                pass
+
+    def handle(self):
+        for line in self.rfile:
+            request = json.loads(line)
+            try:
+                reply = self.server.dispatch(request, self)
+            except Exception as e:
+                reply = {'error': str(e)}
+            reply['id'] = request.get('id')
+            self.send(reply)
+
+
+class LedgerClient(LedgerWrites):
+    # Stands in for LedgerStore when the window runs as a terminal of a LedgerServer. Writes are sent to
+    # the server and acknowledged once journaled there; batches written at other terminals arrive through
+    # on_remote_ops with the server's seq; seq is the server's as of the last read.
+    def __init__(self, address):
+        self.sock = socket.create_connection(address)
+        self.rfile = self.sock.makefile('rb')
+        self.wfile = self.sock.makefile('wb')
+        self.send_lock = threading.Lock()
+        self.replies = {}
+        self.reply_ready = threading.Condition()
+        self.next_id = 0
+        self.connected = True
+        self.batch = []
+        self.batch_depth = 0
+        self.on_status = None
+        self.on_error = None
+        self.on_remote_ops = None
+        self.seq = 0
+        threading.Thread(target=self.receive, name="ledger-client", daemon=True).start()
+
+    def receive(self):
+        try:
+            for line in self.rfile:
+                message = json.loads(line)
+                if message.get('type') == 'ops':
+                    if self.on_remote_ops:
+                        self.on_remote_ops(message['ops'], message['seq'])
+                    continue
+                with self.reply_ready:
+                    self.replies[message['id']] = message
+                    self.reply_ready.notify_all()
+        except OSError:
+            pass
+        with self.reply_ready:
+            self.connected = False
+            self.reply_ready.notify_all()
+        self.report_error("Lost connection to the ledger server")
+
+    def request(self, message):
+        with self.reply_ready:
+            self.next_id += 1
+            request_id = self.next_id
+        with self.send_lock:
+            send_message(self.wfile, {**message, 'id': request_id})
+        with self.reply_ready:
+            self.reply_ready.wait_for(lambda: request_id in self.replies or not self.connected)
+            reply = self.replies.pop(request_id, None)
+        if reply is None:
+            raise ConnectionError("Lost connection to the ledger server")
+        if 'error' in reply:
+            raise RuntimeError(reply['error'])
+        return reply
+
+    def report_error(self, message):
+        if self.on_error:
+            self.on_error(message)
+        else:
+            print(message)
+
+    @contextmanager
+    def unit_of_work(self):
+        # Writes made inside the block are sent to the server as one batch
+        self.batch_depth += 1
+        try:
+            yield
+        finally:
+            self.batch_depth -= 1
+            if not self.batch_depth and self.batch:
+                ops, self.batch = self.batch, []
+                self.send_ops(ops)
+
+    def enqueue(self, name, op, *args, supersedes=False):
+        if self.batch_depth:
+            self.batch.append([name, op, list(args)])
+        else:
+            self.send_ops([[name, op, list(args)]])
+
+    def send_ops(self, ops):
+        try:
+            self.request({'type': 'write', 'ops': ops})
+        except Exception as e:
+            self.report_error(f"Saving {', '.join(sorted({name for name, op, args in ops}))} failed: {e}")
+
+    def flush(self):
+        # Writes are acknowledged by the server before enqueue returns
+        pass
+
+    def dirty_tables(self):
+        return []
+
+    def pending_count(self):
+        return 0
+
+    def replay_journal(self):
+        # The server replays its own journal when it starts
+        return 0
+
+    def table_version(self, name):
+        return self.request({'type': 'version', 'table': name})['result']
+
+    def load_cache(self, name, schema, suffix=''):
+        # Terminals always read current data from the server
+        return None
+
+    def save_cache(self, name, frame, schema, suffix=''):
+        pass
+
+    def has_table(self, name):
+        return self.request({'type': 'has_table', 'table': name})['result']
+
+    def read_table(self, name, start=None, end=None):
+        reply = self.request({'type': 'read', 'table': name, 'start': start, 'end': end})
+        self.seq = reply['seq']
+        return pd.DataFrame(reply['rows'], columns=reply['columns'])
+
+    def read_page(self, name, start=None, end=None, after=None, limit=EXPORT_CHUNK_SIZE):
+        reply = self.request({'type': 'read', 'table': name, 'start': start, 'end': end, 'after': after, 'limit': limit})
+        self.seq = reply['seq']
+        return pd.DataFrame(reply['rows'], columns=reply['columns']), reply['after']
+
+    def read_chunks(self, name, start=None, end=None, chunksize=EXPORT_CHUNK_SIZE):
+        # Pages through the server's copy so neither side holds the whole range at once; each page starts after
+        # the last row of the one before, so rows written meanwhile are neither skipped nor repeated
+        after = None
+        while True:
+            chunk, after = self.read_page(name, start, end, after, chunksize)
+            if len(chunk):
+                yield chunk
+            if len(chunk) < chunksize:
+                return
+
+
+SLIP_LETTERHEAD = ["YouFish2Go Restaurant Co L.L.C", "Al Rayees Shopping Center Shop No : 07", "Landline: 042718736"]
+
+# Title and body lines of each slip type; body lines are formatted with the slip's fields
+SLIP_LAYOUTS = {
+    'salary': ("Salary Slip", [
+        "Name: {Name}", "Year: {Year}", "Month: {Month}", "Designation: {Designation}",
+        "Basic Pay: AED {Basic Pay}", "Housing Allowance: AED {Housing Allowance}",
+        "Transportation Allowance: AED {Transportation Allowance}", "Advance Salary Deducted: AED {Advance Salary Deducted}",
+        "Deductions: AED {Deductions}", "Reason for Deduction: {Reason}", "Total Pay: AED {Total Pay}",
+        "", "Employee Signature: ___________________________",
+    ]),
+    'advance': ("Advance Salary Slip", ["Name: {Name}", "Advance Amount: AED {Advance Amount}", "Deducted in: {Year}-{Month}"]),
+    'payment': ("Payment Slip", ["Company: {Company}", "Total Amount: AED {Total Amount}", "Remaining Balance: AED {Remaining Balance}"]),
+}
+
+
+class SlipRenderer:
+    # Lays out each slip type's header (logo, title, letterhead) once and renders slips from copies of it,
+    # so the logo is decoded once per process rather than once per slip
+    def __init__(self, logo_path):
+        self.logo_path = logo_path
+        self.templates = {}
+
+    def template(self, slip_type):
+        if slip_type not in self.templates:
+            from fpdf import FPDF
+            pdf = FPDF()
+            pdf.add_page()
+            pdf.set_font("Arial", size=12)
+            if os.path.exists(self.logo_path):
+                pdf.image(self.logo_path, x=10, y=8, w=50)
+            pdf.cell(200, 10, txt=SLIP_LAYOUTS[slip_type][0], ln=True, align='C')
+            for line in SLIP_LETTERHEAD:
+                pdf.cell(200, 10, txt=line, ln=True, align='C')
+            self.templates[slip_type] = pdf
+        return self.templates[slip_type]
+
+    def render(self, slip_type, fields, pdf_filename):
+        pdf = copy.deepcopy(self.template(slip_type))
+        for line in SLIP_LAYOUTS[slip_type][1]:
+            pdf.cell(200, 10, txt=line.format(**fields), ln=True)
+        path = os.path.join("data", pdf_filename)
+        pdf.output(path)
+        action_profiler.count(written=os.path.getsize(path))
+        return pdf_filename
+
+
+slip_renderer = SlipRenderer(os.path.join("data", "company_logo.png"))
+
+
+def render_salary_slip(slip):
+    # Names are not unique, so the employee ID keeps two employees' slips for a month apart
+    return slip_renderer.render('salary', slip, f"{slip['Name']}_{slip['Employee ID']}_salary_slip_{slip['Year']}_{slip['Month']}.pdf")
+
+
+class NameTrie:
+    # Case-insensitive prefix index of names for type-ahead; the entries of a name are kept at its last node
     def __init__(self):
+        self.root = {}
+
+    def node(self, text):
+        node = self.root
+        for char in text.casefold():
+            node = node.get(char)
+            if node is None:
+                return {}
+        return node
+
+    def add(self, name, key):
+        node = self.root
+        for char in name.casefold():
+            node = node.setdefault(char, {})
+        node.setdefault(None, {})[key] = name
+
+    def remove(self, name, key):
+        self.node(name).get(None, {}).pop(key, None)
+
+    def exact(self, name):
+        return self.node(name).get(None, {})
+
+    def search(self, prefix):
+        # (name, key) pairs whose name starts with prefix, in name order; cost depends on the matches, not the roster
+        matches = []
+        node = self.node(prefix)
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            matches.extend((name, key) for key, name in node.get(None, {}).items())
+            stack.extend(node[char] for char in sorted((char for char in node if char is not None), reverse=True))
+        return matches
+
+
+class LedgerTable:
+    # A table as a consolidated DataFrame plus a tail of row batches appended since. Appends only add to the
+    # tail, so a run of entries costs O(rows entered) rather than a copy of the table per entry; the tail is
+    # folded in with a single concat (and a merge sort if anything was back-dated) when the frame is next read.
+    def __init__(self, name, df):
+        self.name = name
+        self.df = df
+        self.tail = []
+
+    def append(self, new_rows):
+        self.tail.append(new_rows)
+
+    @property
+    def frame(self):
+        if self.tail:
+            self.df = insert_sorted(self.name, self.df, concat_typed(self.name, self.tail))
+            self.tail = []
+        return self.df
+
+    def between(self, start_date, end_date):
+        return rows_between(self.frame, start_date, end_date)
+
+
+class PartitionedTable:
+    # A dated table held as one LedgerTable per calendar month, so resident memory follows the months in use
+    # rather than the length of the history. load(start, end) reads a span of dates from storage. The hot months
+    # are loaded up front and kept; older months are loaded when a range asks for them and evicted LRU.
+    # Rows with no date are only ever seen by whole-table scans.
+    def __init__(self, name, load):
+        self.name = name
+        self.load = load
+        self.months = OrderedDict()
+        current = pd.Timestamp.today().to_period('M')
+        for month in pd.period_range(current - (HOT_MONTHS - 1), current, freq='M'):
+            self.partition(month)
+
+    def hot_from(self):
+        return pd.Timestamp.today().to_period('M') - (HOT_MONTHS - 1)
+
+    def partition(self, month):
+        table = self.months.get(month)
+        if table is None:
+            table = self.months[month] = LedgerTable(self.name, self.load(month.start_time, month.end_time.normalize()))
+            hot_from = self.hot_from()
+            cold = [loaded for loaded in self.months if loaded < hot_from]
+            for loaded in cold[:max(0, len(cold) - COLD_MONTHS)]:
+                del self.months[loaded]
+        self.months.move_to_end(month)
+        return table
+
+    def append(self, new_rows):
+        # Months not loaded get their rows from storage when they are next read
+        for month, rows in new_rows.groupby(new_rows['Date'].dt.to_period('M'), sort=False):
+            if month in self.months:
+                self.months[month].append(rows)
+
+    def between(self, start_date, end_date):
+        first = pd.Timestamp(start_date).to_period('M')
+        months = pd.period_range(first, max(first, pd.Timestamp(end_date).to_period('M')), freq='M')
+        frames = [self.partition(month).frame for month in months]
+        return rows_between(frames[0] if len(frames) == 1 else concat_typed(self.name, frames), start_date, end_date)
+
+    @property
+    def frame(self):
+        # The whole history, read from storage and not kept
+        return self.load(None, None)
+
+
+class LazyTable:
+    # Loads a table on first attribute access and keeps it in the instance dict, as a LedgerTable for
+    # DataFrame tables (reads return its consolidated frame, assignments replace it) or as the plain record list
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        if self.name not in instance.__dict__:
+            self.__set__(instance, instance.load_table(self.name))
+        value = instance.__dict__[self.name]
+        return value.frame if isinstance(value, (LedgerTable, PartitionedTable)) else value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = LedgerTable(self.name, value) if isinstance(value, pd.DataFrame) else value
+
+
+def format_cell(value):
+    if isinstance(value, pd.Timestamp):
+        return value.strftime("%Y-%m-%d") if value == value.normalize() else str(value)
+    if pd.isna(value):
+        return ""
+    return str(value)
+
+
+class DataFrameModel(QAbstractTableModel):
+    # Table model over a DataFrame: cells are formatted only when the view asks for them,
+    # rows are paged in as the view scrolls, and sort/filter run vectorized on the frame
+    PAGE_SIZE = 500
+
+    def __init__(self, df, parent=None):
+        super().__init__(parent)
+        self.source = df
+        self.df = df
+        self.loaded_rows = min(len(df), self.PAGE_SIZE)
+        # The view's sort; -1 is the source's own order
+        self.sort_column = -1
+        self.sort_order = Qt.AscendingOrder
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded_rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.df.shape[1]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        return format_cell(self.df.iat[index.row(), index.column()])
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return str(self.df.columns[section])
+        return str(section + 1)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.loaded_rows < len(self.df)
+
+    def fetchMore(self, parent=QModelIndex()):
+        count = min(self.PAGE_SIZE, len(self.df) - self.loaded_rows)
+        self.beginInsertRows(QModelIndex(), self.loaded_rows, self.loaded_rows + count - 1)
+        self.loaded_rows += count
+        self.endInsertRows()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        self.sort_column, self.sort_order = column, order
+        if column < 0:
+            # Back to the source's own row order; index labels are keys, not positions
+            self.df = self.source[self.source.index.isin(self.df.index)]
+        else:
+            self.df = self.in_sort_order(self.df)
+        self.layoutChanged.emit()
+
+    def in_sort_order(self, df):
+        if self.sort_column < 0:
+            return df
+        return df.sort_values(df.columns[self.sort_column], ascending=self.sort_order == Qt.AscendingOrder, kind='stable')
+
+    def set_filter(self, text):
+        self.beginResetModel()
+        if text:
+            mask = pd.Series(False, index=self.source.index)
+            for column in self.source.columns:
+                mask |= self.source[column].astype(str).str.contains(text, case=False, regex=False)
+            self.df = self.in_sort_order(self.source[mask])
+        else:
+            self.df = self.in_sort_order(self.source)
+        self.loaded_rows = min(len(self.df), self.PAGE_SIZE)
+        self.endResetModel()
+
+    def row_label(self, row):
+        return self.df.index[row]
+
+    def remove_row(self, row):
+        label = self.df.index[row]
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self.df = self.df.drop(label)
+        self.source = self.source.drop(label)
+        self.loaded_rows -= 1
+        self.endRemoveRows()
+
+
+class ChartService(QObject):
+    # Renders charts to PNG on a worker thread. Figures are plain Agg figures rather than pyplot ones, so
+    # nothing keeps them alive once rendered. Images are cached by key (chart, date range, data versions),
+    # and of several requests queued for the same slot only the latest is rendered.
+    CACHE_SIZE = 32
+    rendered = pyqtSignal(str, object, bytes)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.cache = OrderedDict()
+        self.callbacks = {}
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chart-render")
+        self.rendered.connect(self.deliver)
+
+    def request(self, slot, key, draw, callback):
+        # draw(figure) plots onto a fresh Figure on the worker; callback(png) runs on the GUI thread
+        self.callbacks[slot] = (key, callback)
+        png = self.cache.get(key)
+        if png is not None:
+            self.cache.move_to_end(key)
+            callback(png)
+            return
+        with self.pending_lock:
+            queued = slot in self.pending
+            self.pending[slot] = (key, draw)
+        if not queued:
+            self.worker.submit(self.render, slot)
+
+    def render(self, slot):
+        with self.pending_lock:
+            key, draw = self.pending.pop(slot)
+        started = time.perf_counter()
+        try:
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            figure = Figure()
+            FigureCanvasAgg(figure)
+            draw(figure)
+            buffer = io.BytesIO()
+            figure.savefig(buffer, format='png')
+        except Exception as e:
+            print(f"Rendering {slot} failed: {e}")
+            return
+        action_profiler.add({'action': f"render {slot} chart", 'ms': round((time.perf_counter() - started) * 1000, 2), 'rows': 0, 'bytes': buffer.tell(), 'memory': None})
+        self.rendered.emit(slot, key, buffer.getvalue())
+
+    def deliver(self, slot, key, png):
+        self.cache[key] = png
+        while len(self.cache) > self.CACHE_SIZE:
+            self.cache.popitem(last=False)
+        current = self.callbacks.get(slot)
+        if current and current[0] == key:
+            current[1](png)
+
+    def clear(self):
+        self.cache.clear()
+
+
+def show_png(label, png):
+    pixmap = QPixmap()
+    pixmap.loadFromData(png, 'PNG')
+    label.setPixmap(pixmap)
+
+
+def resident_memory():
+    # Bytes of RAM held by the process: /proc on Linux, else psutil if it is installed, else None
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, AttributeError, ValueError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+class ActionProfiler(QObject):
+    # Times UI actions (see instrumented) from the call until the UI responds again: the action returning, or
+    # the first event loop pass of a dialog it opened, whichever comes first. While an action is open, the
+    # store, loaders and file writers count the rows they touch and the bytes they write into it (GUI thread
+    # only). Records are kept for the Action Timings panel and appended to a JSON-lines trace file.
+    HISTORY = 200
+    recorded = pyqtSignal(dict)
+
+    def __init__(self, trace_path, parent=None):
+        super().__init__(parent)
+        self.trace_path = trace_path
+        self.profile_dir = os.path.join(os.path.dirname(trace_path), "profiles")
+        self.records = deque(maxlen=self.HISTORY)
+        self.lock = threading.Lock()
+        self.active = None
+        # Name of the next action to run under cProfile, or '*' for whichever runs next
+        self.profile_next = None
+
+    @contextmanager
+    def action(self, name):
+        if self.active is not None or threading.current_thread() is not threading.main_thread():
+            # Nested actions count toward the one already open
+            yield
+            return
+        record = self.active = {'action': name, 'ms': None, 'rows': 0, 'bytes': 0, 'memory': None}
+        profile = None
+        if self.profile_next in (name, '*'):
+            self.profile_next = None
+            profile = cProfile.Profile()
+        memory = resident_memory()
+        started = time.perf_counter()
+
+        def finish():
+            if self.active is not record:
+                return
+            self.active = None
+            record['ms'] = round((time.perf_counter() - started) * 1000, 2)
+            if profile:
+                profile.disable()
+                record['profile'] = self.save_profile(name, profile)
+            after = resident_memory()
+            if memory is not None and after is not None:
+                record['memory'] = after - memory
+            self.add(record)
+
+        QTimer.singleShot(0, finish)
+        if profile:
+            profile.enable()
+        try:
+            yield
+        except Exception as e:
+            record['error'] = repr(e)
+            raise
+        finally:
+            finish()
+
+    def count(self, rows=0, written=0):
+        record = self.active
+        if record is not None and threading.current_thread() is threading.main_thread():
+            record['rows'] += int(rows)
+            record['bytes'] += written
+
+    def add(self, record):
+        # Also called from the chart worker thread
+        record = {'time': datetime.now().isoformat(sep=' ', timespec='seconds'), **record}
+        with self.lock:
+            self.records.append(record)
+            with open(self.trace_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + "\n")
+        self.recorded.emit(record)
+
+    def save_profile(self, name, profile):
+        # Binary stats for snakeviz/pstats, plus a text summary of the top calls by cumulative time
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f"{name}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.prof")
+        profile.dump_stats(path)
+        with open(os.path.splitext(path)[0] + ".txt", 'w', encoding='utf-8') as f:
+            pstats.Stats(profile, stream=f).sort_stats('cumulative').print_stats(40)
+        return path
+
+
+action_profiler = ActionProfiler(os.path.join("data", "actions.jsonl"))
+
+
+def instrumented(func):
+    # Runs a UI action, or a handler nested in one, under action_profiler; records are named by the
+    # function's path within the window class, e.g. "list_accounts_payable.mark_as_paid"
+    name = ".".join(part for part in func.__qualname__.split('.')[1:] if part != '<locals>') or func.__name__
+    parameters = inspect.signature(func).parameters.values()
+    if any(parameter.kind == parameter.VAR_POSITIONAL for parameter in parameters):
+        accepted = None
+    else:
+        accepted = sum(parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD) for parameter in parameters)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Qt passes signal arguments (clicked's checked flag) that it would have dropped for the bare function
+        with action_profiler.action(name):
+            return func(*args[:accepted], **kwargs)
+    return wrapper
+
+
+class StoreSignals(QObject):
+    # Carries LedgerStore callbacks from the writer thread to the GUI thread
+    status_changed = pyqtSignal(int)
+    error_occurred = pyqtSignal(str)
+    remote_ops = pyqtSignal(list, int)
+
+
+class YouFish2GoRestaurantCoLLC(QMainWindow):
+    employees = LazyTable()
+    sales = LazyTable()
+    expenses = LazyTable()
+    purchases = LazyTable()
+    accounts_payable = LazyTable()
+    accounts_receivable = LazyTable()
+    payslips = LazyTable()
+    advance_salaries = LazyTable()
+    payable_payments = LazyTable()
+
+    def __init__(self, server=None):
         super().__init__()
         self.setWindowTitle("YouFish2Go Restaurant Co L.L.C")
         self.setGeometry(100, 100, 1000, 700)
 
-        # Initialize data storage
-        self.employees = pd.DataFrame(columns=['Name', 'Nationality', 'Designation', 'Basic Pay', 'Housing Allowance', 'Transportation Allowance'])
-        self.sales = pd.DataFrame(columns=['Date', 'Amount', 'Type'])
-        self.expenses = pd.DataFrame(columns=['Date', 'Amount', 'Category'])
-        self.purchases = pd.DataFrame(columns=['Date', 'Company', 'Payment Type', 'Amount', 'Invoice Number', 'Remaining Balance'])
-        self.accounts_payable = pd.DataFrame(columns=['Date', 'Company', 'Amount', 'Invoice Number', 'Remaining Balance'])
-        self.accounts_receivable = pd.DataFrame(columns=['Date', 'Customer', 'Amount'])
-        self.payslips = []
-        self.advance_salaries = []
-
-        # Load data from Excel files
+        # Tables load lazily from the ledger database, or from the ledger server at (host, port), on first access
+        self.store = open_store(server)
+        self.store_signals = StoreSignals(self)
+        self.store_signals.status_changed.connect(self.update_save_status)
+        self.store_signals.error_occurred.connect(lambda message: QMessageBox.critical(self, "Error", message))
+        self.store_signals.remote_ops.connect(self.apply_remote_ops)
+        self.store.on_status = self.store_signals.status_changed.emit
+        self.store.on_error = self.store_signals.error_occurred.emit
+        self.store.on_remote_ops = self.store_signals.remote_ops.emit
+        self.summary_labels = {}
+        self.charts = ChartService(self)
+        self.chart_dialogs = {}
+        self.pie_label = None
+        self.timings_dialog = None
+        STARTUP_TIMES.append(('open store', time.perf_counter()))
         self.load_all_data()
+        STARTUP_TIMES.append(('replay journal', time.perf_counter()))
 
         # Create Menu Bar
         self.create_menu_bar()
 
         # UI Components
         self.create_widgets()
+        STARTUP_TIMES.append(('build window (loads sales, expenses, purchases)', time.perf_counter()))
+
+        self.save_status_label = QLabel("All changes saved", self)
+        self.statusBar().addPermanentWidget(self.save_status_label)
 
     def create_menu_bar(self):
         menubar = self.menuBar()
@@ -65,6 +1476,10 @@ class YouFish2GoRestaurantCoLLC(QMainWindow):
         generate_advance_action.triggered.connect(self.generate_advance_salary_slip_page)
         payslip_menu.addAction(generate_advance_action)
 
+        run_payroll_action = QAction("Run Payroll", self)
+        run_payroll_action.triggered.connect(self.run_payroll_page)
+        payslip_menu.addAction(run_payroll_action)
+
         list_payslip_action = QAction("List Generated Payslips", self)
         list_payslip_action.triggered.connect(self.list_generated_payslips)
         payslip_menu.addAction(list_payslip_action)
@@ -129,6 +1544,44 @@ class YouFish2GoRestaurantCoLLC(QMainWindow):
         dashboard_action.triggered.connect(self.create_dashboard)
         other_menu.addAction(dashboard_action)
 
+        export_excel_action = QAction("Export to Excel", self)
+        export_excel_action.triggered.connect(self.export_to_excel)
+        other_menu.addAction(export_excel_action)
+
+        timings_action = QAction("Action Timings", self)
+        timings_action.triggered.connect(self.show_action_timings)
+        other_menu.addAction(timings_action)
+
+    def show_action_timings(self):
+        # Modeless and reused, so it can stay open and fill in while the app is used
+        if self.timings_dialog is None:
+            dialog = QDialog(self)
+            dialog.setWindowTitle("Action Timings")
+            dialog.resize(900, 400)
+            layout = QVBoxLayout(dialog)
+            view = QTableView(dialog)
+            layout.addWidget(view)
+            profile_label = QLabel(f"Trace: {os.path.abspath(action_profiler.trace_path)}", dialog)
+            layout.addWidget(profile_label)
+            profile_button = QPushButton("Profile Next Action", dialog)
+            layout.addWidget(profile_button)
+
+            def profile_next():
+                action_profiler.profile_next = '*'
+                profile_label.setText("The next action will be profiled; its stats file is listed under 'profile'")
+
+            def refresh(record=None):
+                # Newest first; memory is the change in resident memory over the action
+                records = pd.DataFrame(list(action_profiler.records)[::-1], columns=['time', 'action', 'ms', 'rows', 'bytes', 'memory', 'profile', 'error'])
+                view.setModel(DataFrameModel(records, view))
+
+            profile_button.clicked.connect(profile_next)
+            action_profiler.recorded.connect(refresh)
+            refresh()
+            self.timings_dialog = dialog
+        self.timings_dialog.show()
+        self.timings_dialog.raise_()
+
     def create_widgets(self):
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -166,17 +1619,16 @@ class YouFish2GoRestaurantCoLLC(QMainWindow):
         summary_layout = QGridLayout()
         summary_layout.setSpacing(20)
 
-        total_sales = self.sales['Amount'].sum()
-        total_expenses = self.expenses['Amount'].sum()
-        total_purchases = self.purchases['Amount'].sum()
-
-        total_sales_label = QLabel(f"<h2>Total Sales: AED {total_sales}</h2>", self)
-        total_expenses_label = QLabel(f"<h2>Total Expenses: AED {total_expenses}</h2>", self)
-        total_purchases_label = QLabel(f"<h2>Total Purchases: AED {total_purchases}</h2>", self)
+        self.summary_labels = {
+            'sales': QLabel(self),
+            'expenses': QLabel(self),
+            'purchases': QLabel(self),
+        }
+        self.refresh_summary()
 
-        summary_layout.addWidget(total_sales_label, 0, 0)
-        summary_layout.addWidget(total_expenses_label, 0, 1)
-        summary_layout.addWidget(total_purchases_label, 1, 0, 1, 2)
+        summary_layout.addWidget(self.summary_labels['sales'], 0, 0)
+        summary_layout.addWidget(self.summary_labels['expenses'], 0, 1)
+        summary_layout.addWidget(self.summary_labels['purchases'], 1, 0, 1, 2)
 
         main_layout.addLayout(summary_layout)
         summary_layout.setAlignment(Qt.AlignCenter)
@@ -186,16 +1638,10 @@ class YouFish2GoRestaurantCoLLC(QMainWindow):
         chart_layout.setContentsMargins(0, 0, 0, 0)
         chart_layout.setSpacing(10)
 
-        # Ensure valid data for the pie chart
-        if total_sales > 0 or total_expenses > 0:
-            fig, ax = plt.subplots()
-            ax.pie([total_sales, total_expenses], labels=['Sales', 'Expenses'], autopct='%1.1f%%')
-            ax.axis('equal')
-            canvas = FigureCanvas(fig)
-            chart_layout.addWidget(canvas, alignment=Qt.AlignCenter)
-        else:
-            empty_chart_label = QLabel("No sales or expenses data available for the chart.")
-            chart_layout.addWidget(empty_chart_label, alignment=Qt.AlignCenter)
+        # The pie is rendered in the background once the window is up, and redrawn when the totals change
+        self.pie_label = QLabel(self)
+        chart_layout.addWidget(self.pie_label, alignment=Qt.AlignCenter)
+        QTimer.singleShot(0, self.update_pie)
 
         main_layout.addLayout(chart_layout)
 
@@ -203,120 +1649,201 @@ class YouFish2GoRestaurantCoLLC(QMainWindow):
         logo_path = os.path.join("data", "company_logo.png")
         if os.path.exists(logo_path):
             try:
-                from PyQt5.QtGui import QPixmap
                 logo = QLabel(self)
                 pixmap = QPixmap(logo_path).scaled(150, 150, Qt.KeepAspectRatio, Qt.SmoothTransformation)
                 logo.setPixmap(pixmap)
                 main_layout.addWidget(logo, alignment=Qt.AlignCenter)
             except Exception as e:
                 print(f"Error loading logo: {e}")
-            central_widget = QWidget()
-            self.setCentralWidget(central_widget)
-            main_layout = QVBoxLayout(central_widget)
-            main_layout.setContentsMargins(10, 10, 10, 10)
-            main_layout.setSpacing(20)
-
-            title_label = QLabel("YouFish2Go Restaurant Co L.L.C", self)
-            title_label.setStyleSheet("font-size: 24px; font-weight: bold; color: blue;")
-            main_layout.addWidget(title_label, alignment=Qt.AlignCenter)
-
-            # Add Quick Action Buttons
-            button_layout = QHBoxLayout()
-            button_layout.setSpacing(20)
-
-            add_employee_button = QPushButton("Add Employee", self)
-            add_employee_button.clicked.connect(self.add_employee)
-            button_layout.addWidget(add_employee_button)
-
-            add_sales_button = QPushButton("Add Sales", self)
-            add_sales_button.clicked.connect(self.add_sales)
-            button_layout.addWidget(add_sales_button)
-
-            add_expense_button = QPushButton("Add Expense", self)
-            add_expense_button.clicked.connect(self.add_expense)
-            button_layout.addWidget(add_expense_button)
-
-            view_reports_button = QPushButton("View Reports", self)
-            view_reports_button.clicked.connect(self.generate_custom_sales_report)
-            button_layout.addWidget(view_reports_button)
-
-            main_layout.addLayout(button_layout)
-
-            # Add Summary Information
-            summary_layout = QGridLayout()
-            summary_layout.setSpacing(20)
-
-            total_sales = self.sales['Amount'].sum()
-            total_expenses = self.expenses['Amount'].sum()
-            total_purchases = self.purchases['Amount'].sum()
-
-            total_sales_label = QLabel(f"<h2>Total Sales: AED {total_sales}</h2>", self)
-            total_expenses_label = QLabel(f"<h2>Total Expenses: AED {total_expenses}</h2>", self)
-            total_purchases_label = QLabel(f"<h2>Total Purchases: AED {total_purchases}</h2>", self)
-
-            summary_layout.addWidget(total_sales_label, 0, 0)
-            summary_layout.addWidget(total_expenses_label, 0, 1)
-            summary_layout.addWidget(total_purchases_label, 1, 0, 1, 2)
-
-            main_layout.addLayout(summary_layout)
-            summary_layout.setAlignment(Qt.AlignCenter)
-
-            # Add a Chart
-            chart_layout = QVBoxLayout()
-            chart_layout.setContentsMargins(0, 0, 0, 0)
-            chart_layout.setSpacing(10)
-
-            if not (pd.isna(total_sales) or pd.isna(total_expenses)):
-                fig, ax = plt.subplots()
-                ax.pie([total_sales, total_expenses], labels=['Sales', 'Expenses'], autopct='%1.1f%%')
-                ax.axis('equal')
-                canvas = FigureCanvas(fig)
-                chart_layout.addWidget(canvas, alignment=Qt.AlignCenter)
-
-            main_layout.addLayout(chart_layout)
-
-            # Display Logo
-            logo_path = os.path.join("data", "company_logo.png")
-            if os.path.exists(logo_path):
-                try:
-                    from PyQt5.QtGui import QPixmap
-                    logo = QLabel(self)
-                    pixmap = QPixmap(logo_path)
-                    logo.setPixmap(pixmap)
-                    main_layout.addWidget(logo, alignment=Qt.AlignCenter)
-                except Exception as e:
-                    print(f"Error loading logo: {e}")
+
+    def refresh_summary(self):
+        captions = {'sales': "Total Sales", 'expenses': "Total Expenses", 'purchases': "Total Purchases"}
+        for df_name, label in self.summary_labels.items():
+            label.setText(f"<h2>{captions[df_name]}: AED {self.table_total(df_name)}</h2>")
+        self.update_pie()
+
+    def update_pie(self):
+        if self.pie_label is None:
+            return
+        total_sales = self.table_total('sales')
+        total_expenses = self.table_total('expenses')
+        # Ensure valid data for the pie chart
+        if not (total_sales > 0 or total_expenses > 0):
+            self.pie_label.setText("No sales or expenses data available for the chart.")
+            return
+
+        def draw(figure):
+            ax = figure.add_subplot()
+            ax.pie([total_sales, total_expenses], labels=['Sales', 'Expenses'], autopct='%1.1f%%')
+            ax.axis('equal')
+
+        key = ('pie', self.revision('sales'), self.revision('expenses'))
+        self.charts.request('pie', key, draw, lambda png: show_png(self.pie_label, png))
+
+    def show_chart(self, title, key, draw):
+        # Each report keeps one dialog, reused across requests; a cached image shows at once, otherwise
+        # it appears when the worker has rendered it
+        dialog = self.chart_dialogs.get(title)
+        if dialog is None:
+            dialog = QDialog(self)
+            dialog.setWindowTitle(title)
+            dialog.chart_label = QLabel(dialog)
+            dialog.chart_label.setAlignment(Qt.AlignCenter)
+            dialog.chart_label.setMinimumSize(640, 480)
+            QVBoxLayout(dialog).addWidget(dialog.chart_label)
+            self.chart_dialogs[title] = dialog
+        dialog.chart_label.setText("Rendering chart...")
+        self.charts.request(title, key, draw, lambda png: show_png(dialog.chart_label, png))
+        dialog.exec_()
 
     def load_from_excel(self, filename):
+        table_name = os.path.splitext(filename)[0]
+        if self.store.has_table(table_name):
+            return self.store.read_table(table_name)
         filepath = os.path.join("data", filename)
         if os.path.exists(filepath):
-            return pd.read_excel(filepath)
-        return pd.DataFrame()
-
+            # One-time migration of a legacy workbook into the ledger database
+            dataframe = pd.read_excel(filepath)
+            self.store.replace_table(table_name, dataframe)
+            return dataframe
+        # Not written yet (a new install, or a table added since): empty, with its columns
+        return pd.DataFrame(columns=list(TABLE_SCHEMAS[table_name]))
+
+    @instrumented
     def load_all_data(self):
-        self.employees = self.load_from_excel('employees.xlsx')
-        self.sales = self.load_from_excel('sales.xlsx')
-        self.expenses = self.load_from_excel('expenses.xlsx')
-        self.purchases = self.load_from_excel('purchases.xlsx')
-        self.accounts_payable = self.load_from_excel('accounts_payable.xlsx')
-        self.accounts_receivable = self.load_from_excel('accounts_receivable.xlsx')
-        self.payslips = self.load_from_excel('payslips.xlsx').to_dict('records')
-        self.advance_salaries = self.load_from_excel('advance_salaries.xlsx').to_dict('records')
-
-        self.check_and_rename_columns(self.employees, 'employees', ['Name', 'Nationality', 'Designation', 'Basic Pay', 'Housing Allowance', 'Transportation Allowance'])
-        self.check_and_rename_columns(self.sales, 'sales', ['Date', 'Amount', 'Type'])
-        self.check_and_rename_columns(self.expenses, 'expenses', ['Date', 'Amount', 'Category'])
-        self.check_and_rename_columns(self.purchases, 'purchases', ['Date', 'Company', 'Payment Type', 'Amount', 'Invoice Number', 'Remaining Balance'])
-        self.check_and_rename_columns(self.accounts_payable, 'accounts_payable', ['Date', 'Company', 'Amount', 'Invoice Number', 'Remaining Balance'])
-        self.check_and_rename_columns(self.accounts_receivable, 'accounts_receivable', ['Date', 'Customer', 'Amount'])
-
-    def check_and_rename_columns(self, df, df_name, expected_columns):
+        # Writes journaled before a crash but never committed are applied before anything is read
+        self.store.replay_journal()
+        # Drop loaded copies; each table is re-read on its next access
+        for df_name in TABLE_SCHEMAS:
+            self.__dict__.pop(df_name, None)
+        # Running column sums per table, built on first use and then kept current by every write
+        self.totals = {}
+        self.rollups = {}
+        self.advances_by_period = None
+        self.employee_names = None
+        self.payables_by_vendor = None
+        # Bumped on every change to a loaded table; part of the chart cache keys
+        self.revisions = {}
+        # Store seq each loaded table was read at, against which remote batches are checked
+        self.read_seqs = {}
+        self.charts.clear()
+
+    def load_table(self, df_name):
+        if df_name in PARTITIONED_TABLES:
+            return self.load_partitions(df_name)
+        schema = TABLE_SCHEMAS[df_name]
+        df = self.store.load_cache(df_name, schema)
+        if df is None:
+            df = self.load_from_excel(f'{df_name}.xlsx')
+            if df_name in RECORD_TABLES:
+                df = self.add_later_columns(df, df_name)
+            else:
+                df = sort_by_date(self.check_and_rename_columns(df, df_name))
+            if df_name in KEY_COLUMNS:
+                df = self.assign_missing_keys(df_name, df)
+            self.store.save_cache(df_name, df, schema)
+        self.note_read(df_name)
+        action_profiler.count(rows=len(df))
+        if df_name in RECORD_TABLES:
+            return df.to_dict('records')
+        return set_key_index(df_name, sort_by_date(df))
+
+    def load_partitions(self, df_name):
+        if not self.store.has_table(df_name):
+            # Migrates a legacy workbook, if there is one
+            self.load_from_excel(f'{df_name}.xlsx')
+        self.store.ensure_index(df_name, 'Date', unique=False)
+        return PartitionedTable(df_name, lambda start, end: self.read_range(df_name, start, end))
+
+    def read_range(self, df_name, start, end):
+        if self.store.has_table(df_name):
+            df = self.store.read_table(df_name, start, end)
+            self.note_read(df_name)
+        else:
+            df = pd.DataFrame(columns=list(TABLE_SCHEMAS[df_name]))
+        action_profiler.count(rows=len(df))
+        return sort_by_date(self.check_and_rename_columns(df, df_name))
+
+    def table_chunks(self, df_name):
+        # Whole-table aggregates of partitioned tables stream the history from storage instead of loading it
+        if df_name not in PARTITIONED_TABLES:
+            yield getattr(self, df_name)
+            return
+        self.ledger_table(df_name)
+        if self.store.has_table(df_name):
+            for chunk in self.store.read_chunks(df_name):
+                self.note_read(df_name)
+                yield self.check_and_rename_columns(chunk, df_name)
+
+    def build_aggregates(self, df_name):
+        # Totals and rollup of a partitioned table: from the cache written at close if the table is unchanged
+        # since, else from one streaming pass
+        schema = TABLE_SCHEMAS[df_name]
+        aggregates = self.store.load_cache(df_name, schema, suffix='.aggregates')
+        if aggregates is None:
+            money_columns = [c for c, kind in schema.items() if kind == 'money']
+            sums = dict.fromkeys(money_columns, 0.0)
+            rollup = Rollup() if df_name in ROLLUP_KEYS else None
+            for chunk in self.table_chunks(df_name):
+                for column in money_columns:
+                    sums[column] += float(chunk[column].sum())
+                if rollup is not None:
+                    rollup.add_frame(chunk, ROLLUP_KEYS[df_name])
+            aggregates = {'totals': {c: round(total, 2) for c, total in sums.items()}, 'rollup': rollup}
+        self.totals.setdefault(df_name, aggregates['totals'])
+        if aggregates['rollup'] is not None:
+            self.rollups.setdefault(df_name, aggregates['rollup'])
+
+    def assign_missing_keys(self, df_name, df):
+        key_column = KEY_COLUMNS[df_name]
+        missing = df[key_column] == ''
+        if missing.any():
+            # Rows saved before keys existed get one once, and the table is rewritten with them
+            df = df.copy()
+            df.loc[missing, key_column] = [new_key() for _ in range(missing.sum())]
+            self.save_to_excel(f'{df_name}.xlsx', df)
+        self.store.ensure_index(df_name, key_column)
+        return df
+
+    def save_table_caches(self):
+        for df_name in TABLE_SCHEMAS:
+            if df_name in PARTITIONED_TABLES:
+                if df_name in self.totals and (df_name not in ROLLUP_KEYS or df_name in self.rollups):
+                    aggregates = {'totals': self.totals[df_name], 'rollup': self.rollups.get(df_name)}
+                    self.store.save_cache(df_name, aggregates, TABLE_SCHEMAS[df_name], suffix='.aggregates')
+            elif df_name in self.__dict__:
+                df = getattr(self, df_name)
+                self.store.save_cache(df_name, pd.DataFrame(df) if df_name in RECORD_TABLES else df, TABLE_SCHEMAS[df_name])
+
+    def update_save_status(self, pending):
+        if hasattr(self, 'save_status_label'):
+            self.save_status_label.setText(f"Saving {', '.join(self.store.dirty_tables())}..." if pending else "All changes saved")
+
+    def closeEvent(self, event):
+        self.store.flush()
+        self.save_table_caches()
+        super().closeEvent(event)
+
+    def check_and_rename_columns(self, df, df_name):
+        expected_columns = list(TABLE_SCHEMAS[df_name])
+        key_column = KEY_COLUMNS.get(df_name)
+        if key_column and key_column not in df.columns and set(expected_columns) - {key_column} <= set(df.columns):
+            df = df.assign(**{key_column: ''})
+        df = self.add_later_columns(df, df_name)
         if set(expected_columns).issubset(df.columns):
             df = df[expected_columns]
         else:
             print(f"Warning: {df_name} DataFrame is missing expected columns. Available columns: {list(df.columns)}")
             df = pd.DataFrame(columns=expected_columns)
-        setattr(self, df_name, df)
+        return apply_schema(df, df_name)
+
+    def add_later_columns(self, df, df_name):
+        expected_columns = list(TABLE_SCHEMAS[df_name])
+        later_columns = [column for column in LATER_COLUMNS.get(df_name, []) if column not in df.columns]
+        if later_columns and set(expected_columns) - set(later_columns) <= set(df.columns):
+            df = apply_schema(df.assign(**{column: None for column in later_columns})[expected_columns], df_name)
+            self.save_to_excel(f'{df_name}.xlsx', df)
+        return df
 
     def add_employee(self):
         dialog = QDialog(self)
@@ -346,6 +1873,7 @@ class YouFish2GoRestaurantCoLLC(QMainWindow):
         layout.addWidget(save_button)
         dialog.exec_()
 
+    @instrumented
     def save_employee(self, dialog, name_entry, nationality_entry, designation_entry, basic_pay_entry, housing_allowance_entry, transportation_allowance_entry):
         new_employee = {
             'Name': name_entry.text(),
@@ -355,23 +1883,35 @@ class YouFish2GoRestaurantCoLLC(QMainWindow):
             'Housing Allowance': float(housing_allowance_entry.text() or 0),
             'Transportation Allowance': float(transportation_allowance_entry.text() or 0)
         }
-        self.employees = pd.concat([self.employees, pd.DataFrame([new_employee])], ignore_index=True)
-        self.save_to_excel('employees.xlsx', self.employees)
+        self.append_rows('employees', [new_employee])
         dialog.accept()
         self.show_employee_list()
 
+    def create_table_view(self, dialog, layout, df):
+        model = DataFrameModel(df, dialog)
+
+        filter_entry = QLineEdit(dialog)
+        filter_entry.setPlaceholderText("Filter")
+        filter_entry.textChanged.connect(model.set_filter)
+        layout.addWidget(filter_entry)
+
+        view = QTableView(dialog)
+        view.setModel(model)
+        view.setSelectionBehavior(QTableView.SelectRows)
+        view.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        view.setSortingEnabled(True)
+        for column in set(KEY_COLUMNS.values()) & set(df.columns):
+            view.setColumnHidden(df.columns.get_loc(column), True)
+        layout.addWidget(view)
+        return view, model
+
+    @instrumented
     def show_employee_list(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("Employee List")
         layout = QVBoxLayout(dialog)
 
-        table = QTableWidget(self.employees.shape[0], self.employees.shape[1], self)
-        table.setHorizontalHeaderLabels(self.employees.columns)
-        for i in range(self.employees.shape[0]):
-            for j in range(self.employees.shape[1]):
-                table.setItem(i, j, QTableWidgetItem(str(self.employees.iat[i, j])))
-
-        layout.addWidget(table)
+        self.create_table_view(dialog, layout, self.employees)
         dialog.exec_()
 
     def delete_employee(self):
@@ -379,33 +1919,267 @@ class YouFish2GoRestaurantCoLLC(QMainWindow):
         dialog.setWindowTitle("Delete Employee")
         layout = QFormLayout(dialog)
 
-        name_entry = QLineEdit(dialog)
-        layout.addRow("Name", name_entry)
+        employee_combobox = self.create_employee_combobox(dialog)
+        layout.addRow("Employee", employee_combobox)
 
         delete_button = QPushButton("Delete", dialog)
-        delete_button.clicked.connect(lambda: self.confirm_delete_employee(dialog, name_entry))
+        delete_button.clicked.connect(lambda: self.confirm_delete_employee(dialog, employee_combobox))
         layout.addWidget(delete_button)
 
         dialog.exec_()
 
-    def confirm_delete_employee(self, dialog, name_entry):
-        name = name_entry.text()
-        self.employees = self.employees[self.employees['Name'] != name]
-        self.save_to_excel('employees.xlsx', self.employees)
+    @instrumented
+    def confirm_delete_employee(self, dialog, employee_combobox):
+        employee_id = self.selected_employee_id(employee_combobox)
+        if employee_id is None:
+            QMessageBox.warning(self, "Warning", "Please select an employee")
+            return
+        self.drop_rows('employees', [employee_id])
         dialog.accept()
         self.show_employee_list()
 
     def save_to_excel(self, filename, dataframe):
-        filepath = os.path.join("data", filename)
-        dataframe.to_excel(filepath, index=False)
+        self.store.replace_table(os.path.splitext(filename)[0], dataframe)
+
+    def append_rows(self, df_name, rows):
+        if df_name in KEY_COLUMNS:
+            rows = [{KEY_COLUMNS[df_name]: new_key(), **row} for row in rows]
+        new_rows = apply_schema(pd.DataFrame(rows), df_name)
+        if df_name in PARTITIONED_TABLES and df_name not in self.totals:
+            # Aggregates are read from storage, which does not have these rows yet; built during the merge they
+            # would miss them for good
+            self.build_aggregates(df_name)
+        self.merge_rows(df_name, new_rows)
+        self.store.append_rows(df_name, new_rows)
+
+    def drop_rows(self, df_name, labels):
+        self.remove_rows(df_name, labels)
+        if df_name in KEY_COLUMNS:
+            self.store.delete_rows(df_name, KEY_COLUMNS[df_name], list(labels))
+        else:
+            self.save_to_excel(f'{df_name}.xlsx', getattr(self, df_name))
+
+    def set_value(self, df_name, label, column, value):
+        self.assign_value(df_name, label, column, value)
+        if df_name in KEY_COLUMNS:
+            self.store.update_value(df_name, KEY_COLUMNS[df_name], label, column, value)
+        else:
+            self.save_to_excel(f'{df_name}.xlsx', getattr(self, df_name))
+
+    # merge_rows, remove_rows and assign_value change only the loaded copy and its aggregates
+    def merge_rows(self, df_name, new_rows):
+        self.touch(df_name)
+        self.ledger_table(df_name).append(new_rows)
+        self.adjust_totals(df_name, new_rows)
+        self.adjust_rollup(df_name, new_rows)
+        self.adjust_advances(df_name, new_rows)
+        self.adjust_employee_names(df_name, new_rows)
+        self.adjust_vendor_ledger(df_name, new_rows)
+
+    def remove_rows(self, df_name, labels):
+        self.touch(df_name)
+        df = getattr(self, df_name)
+        self.adjust_totals(df_name, df.loc[labels], sign=-1)
+        self.adjust_rollup(df_name, df.loc[labels], sign=-1)
+        self.adjust_advances(df_name, df.loc[labels], sign=-1)
+        self.adjust_employee_names(df_name, df.loc[labels], sign=-1)
+        self.adjust_vendor_ledger(df_name, df.loc[labels], sign=-1)
+        setattr(self, df_name, df.drop(labels))
+
+    def assign_value(self, df_name, label, column, value):
+        self.touch(df_name)
+        df = getattr(self, df_name)
+        if df_name in self.totals and column in self.totals[df_name]:
+            self.totals[df_name][column] = round(self.totals[df_name][column] + float(value - df.at[label, column]), 2)
+        self.adjust_vendor_ledger(df_name, df.loc[[label]], sign=-1)
+        df.at[label, column] = value
+        self.adjust_vendor_ledger(df_name, df.loc[[label]])
+        self.refresh_summary()
+
+    def ledger_table(self, df_name):
+        # The loaded table itself, without consolidating it as attribute access does
+        if df_name not in self.__dict__:
+            setattr(self, df_name, self.load_table(df_name))
+        return self.__dict__[df_name]
+
+    def note_read(self, df_name):
+        # The store seq the loaded data of a table reflects; remote batches at or below it are already in it
+        self.read_seqs[df_name] = max(self.read_seqs.get(df_name, 0), self.store.seq)
+
+    def touch(self, df_name):
+        self.revisions[df_name] = self.revisions.get(df_name, 0) + 1
+
+    def revision(self, df_name):
+        return self.revisions.get(df_name, 0)
+
+    def apply_remote_ops(self, ops, seq):
+        # Batches written at other terminals; tables not loaded yet will read them from the server anyway
+        for df_name, op, args in ops:
+            if df_name not in self.__dict__:
+                continue
+            if seq <= self.read_seqs.get(df_name, 0):
+                # The table was read since the batch was written, so what was read may already hold it. A table
+                # read in one piece is skipped; partitions and aggregates read at other times are read again.
+                if df_name in PARTITIONED_TABLES:
+                    self.forget_table(df_name)
+                continue
+            if op == 'append_rows':
+                name, columns, types, rows = args
+                new_rows = pd.DataFrame(rows, columns=columns)
+                if df_name in RECORD_TABLES:
+                    self.__dict__[df_name].extend(new_rows.to_dict('records'))
+                else:
+                    self.merge_rows(df_name, apply_schema(new_rows, df_name))
+            elif op == 'update_value':
+                name, key_column, key, column, value = args
+                if key in getattr(self, df_name).index:
+                    self.assign_value(df_name, key, column, value)
+            elif op == 'delete_rows':
+                name, key_column, keys = args
+                index = getattr(self, df_name).index
+                self.remove_rows(df_name, [key for key in keys if key in index])
+            elif op == 'replace_table':
+                self.forget_table(df_name)
+        self.refresh_summary()
+
+    def forget_table(self, df_name):
+        # The next access reads the table and its aggregates from storage again
+        self.touch(df_name)
+        del self.__dict__[df_name]
+        self.totals.pop(df_name, None)
+        self.rollups.pop(df_name, None)
+        if df_name == 'accounts_payable':
+            self.payables_by_vendor = None
+        elif df_name == 'employees':
+            self.employee_names = None
+        elif df_name == 'advance_salaries':
+            self.advances_by_period = None
+
+    def table_total(self, df_name, column='Amount'):
+        if df_name not in self.totals and df_name in PARTITIONED_TABLES:
+            self.build_aggregates(df_name)
+        if df_name not in self.totals:
+            df = getattr(self, df_name)
+            money_columns = [c for c, kind in TABLE_SCHEMAS[df_name].items() if kind == 'money']
+            self.totals[df_name] = {c: round(float(df[c].sum()), 2) for c in money_columns}
+        return self.totals[df_name][column]
+
+    def rollup(self, df_name):
+        if df_name not in self.rollups and df_name in PARTITIONED_TABLES:
+            self.build_aggregates(df_name)
+        if df_name not in self.rollups:
+            self.rollups[df_name] = Rollup.from_frame(getattr(self, df_name), ROLLUP_KEYS[df_name])
+        return self.rollups[df_name]
+
+    def adjust_rollup(self, df_name, rows, sign=1):
+        if df_name in self.rollups:
+            key_column = ROLLUP_KEYS[df_name]
+            for day, key, amount in zip(rows['Date'], rows[key_column], rows['Amount']):
+                self.rollups[df_name].add(day, key, sign * amount)
+
+    def advance_totals(self):
+        # Advances summed per employee ID in a dict per (Year, Month), so netting a period looks up that period only
+        if self.advances_by_period is None:
+            self.advances_by_period = {}
+            self.add_advances(self.advance_salaries)
+        return self.advances_by_period
+
+    def add_advances(self, rows, sign=1):
+        for (year, month, employee_id), amount in rows.groupby(['Year', 'Month', 'Employee ID'])['Advance Salary'].sum().items():
+            period = self.advances_by_period.setdefault((int(year), int(month)), {})
+            period[employee_id] = period.get(employee_id, 0.0) + sign * float(amount)
+
+    def adjust_advances(self, df_name, rows, sign=1):
+        if df_name == 'advance_salaries' and self.advances_by_period is not None:
+            self.add_advances(rows, sign)
+
+    def employee_index(self):
+        if self.employee_names is None:
+            self.employee_names = NameTrie()
+            for employee_id, name in zip(self.employees.index, self.employees['Name']):
+                self.employee_names.add(name, employee_id)
+        return self.employee_names
+
+    def adjust_employee_names(self, df_name, rows, sign=1):
+        if df_name == 'employees' and self.employee_names is not None:
+            for employee_id, name in zip(rows['ID'], rows['Name']):
+                if sign > 0:
+                    self.employee_names.add(name, employee_id)
+                else:
+                    self.employee_names.remove(name, employee_id)
+
+    def vendor_ledger(self):
+        if self.payables_by_vendor is None:
+            self.payables_by_vendor = VendorLedger.from_frame(self.accounts_payable)
+        return self.payables_by_vendor
+
+    def adjust_vendor_ledger(self, df_name, rows, sign=1):
+        if df_name == 'accounts_payable' and self.payables_by_vendor is not None:
+            for company, day, amount in zip(rows['Company'], rows['Date'], rows['Remaining Balance']):
+                self.payables_by_vendor.add(company, day, sign * amount)
+
+    def vendor_aging(self):
+        # One row per company with an open balance, largest first
+        ledger = self.vendor_ledger()
+        aging = ledger.aging(pd.Timestamp.today().normalize())
+        rows = [[company, round(ledger.balances[company], 2)] + [round(amount, 2) for amount in aging[company]]
+                for company in aging if round(ledger.balances[company], 2)]
+        summary = pd.DataFrame(rows, columns=['Company', 'Balance'] + [label for label, oldest in AGING_BUCKETS])
+        return summary.sort_values('Balance', ascending=False, kind='stable', ignore_index=True)
+
+    def employee_label(self, employee_id):
+        # Names shared by several employees are told apart by designation and the start of the ID
+        employee = self.employees.loc[employee_id]
+        if len(self.employee_index().exact(employee['Name'])) > 1:
+            return f"{employee['Name']} ({employee['Designation']}, {employee_id[:6]})"
+        return employee['Name']
+
+    def create_employee_combobox(self, parent):
+        # Typing narrows the list through the name trie; each item carries the employee ID
+        combobox = QComboBox(parent)
+        combobox.setEditable(True)
+        combobox.setInsertPolicy(QComboBox.NoInsert)
+
+        def fill(prefix):
+            combobox.blockSignals(True)
+            combobox.clear()
+            for name, employee_id in self.employee_index().search(prefix):
+                combobox.addItem(self.employee_label(employee_id), employee_id)
+            combobox.setEditText(prefix)
+            combobox.blockSignals(False)
+
+        fill('')
+        if combobox.count():
+            combobox.setCurrentIndex(0)
+        combobox.lineEdit().textEdited.connect(fill)
+        return combobox
+
+    def selected_employee_id(self, combobox):
+        index = combobox.findText(combobox.currentText())
+        return combobox.itemData(index) if index >= 0 else None
+
+    def adjust_totals(self, df_name, rows, sign=1):
+        if df_name in self.totals:
+            totals = self.totals[df_name]
+            for column in totals:
+                totals[column] = round(totals[column] + sign * float(rows[column].sum()), 2)
+        self.refresh_summary()
+
+    @instrumented
+    def export_to_excel(self):
+        exported = []
+        for table_name in TABLE_SCHEMAS:
+            if self.store.has_table(table_name):
+                export_table(self.store, table_name, os.path.join("data", f"{table_name}.xlsx"))
+                exported.append(f"{table_name}.xlsx")
+        QMessageBox.information(self, "Success", f"Exported {len(exported)} tables to the data folder.")
 
     def generate_salary_slip_page(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("Generate Salary Slip")
         layout = QFormLayout(dialog)
 
-        employee_combobox = QComboBox(dialog)
-        employee_combobox.addItems(self.employees['Name'].tolist())
+        employee_combobox = self.create_employee_combobox(dialog)
         layout.addRow("Select Employee", employee_combobox)
 
         year_entry = QLineEdit(dialog)
@@ -426,18 +2200,22 @@ class YouFish2GoRestaurantCoLLC(QMainWindow):
 
         dialog.exec_()
 
+    @instrumented
     def generate_slip(self, dialog, employee_combobox, year_entry, month_entry, deductions_entry, reason_entry):
-        selected_employee_name = employee_combobox.currentText()
+        employee_id = self.selected_employee_id(employee_combobox)
         year = year_entry.text()
         month = month_entry.text()
         deductions = deductions_entry.text()
         reason = reason_entry.text()
 
-        if not selected_employee_name or not year or not month:
+        if employee_id is None or not year or not month:
             QMessageBox.warning(self, "Warning", "Please fill all required fields")
             return
+        if not (year.isdigit() and month.isdigit()):
+            QMessageBox.warning(self, "Warning", "Year and Month must be numbers")
+            return
 
-        selected_employee = self.employees[self.employees['Name'] == selected_employee_name].iloc[0]
+        selected_employee = self.employees.loc[employee_id]
         name = selected_employee['Name']
         nationality = selected_employee['Nationality']
         designation = selected_employee['Designation']
@@ -450,130 +2228,160 @@ class YouFish2GoRestaurantCoLLC(QMainWindow):
         else:
             deductions = 0.0
 
-        advance_salary_deducted = sum(
-            adv['Advance Salary'] for adv in self.advance_salaries if adv['Employee'] == name and adv['Year'] == year and adv['Month'] == month
-        )
+        advance_salary_deducted = self.advance_deductions(year, month).get(employee_id, 0.0)
 
         total_pay = basic_pay + housing_allowance + transportation_allowance - deductions - advance_salary_deducted
         creation_datetime = datetime.now().strftime("%Y-%m-%d %H-%M-%S")
 
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
+        pdf_filename = render_salary_slip({
+            'Name': name, 'Employee ID': employee_id, 'Year': year, 'Month': month, 'Designation': designation,
+            'Basic Pay': basic_pay, 'Housing Allowance': housing_allowance, 'Transportation Allowance': transportation_allowance,
+            'Advance Salary Deducted': advance_salary_deducted, 'Deductions': deductions, 'Reason': reason, 'Total Pay': total_pay,
+        })
 
-        logo_path = os.path.join("data", "company_logo.png")
-        if os.path.exists(logo_path):
-            pdf.image(logo_path, x=10, y=8, w=50)
-
-        pdf.cell(200, 10, txt="Salary Slip", ln=True, align='C')
-        pdf.cell(200, 10, txt="YouFish2Go Restaurant Co L.L.C", ln=True, align='C')
-        pdf.cell(200, 10, txt="Al Rayees Shopping Center Shop No : 07", ln=True, align='C')
-        pdf.cell(200, 10, txt="Landline: 042718736", ln=True, align='C')
-        pdf.cell(200, 10, txt=f"Name: {name}", ln=True)
-        pdf.cell(200, 10, txt=f"Year: {year}", ln=True)
-        pdf.cell(200, 10, txt=f"Month: {month}", ln=True)
-        pdf.cell(200, 10, txt=f"Designation: {designation}", ln=True)
-        pdf.cell(200, 10, txt=f"Basic Pay: AED {basic_pay}", ln=True)
-        pdf.cell(200, 10, txt=f"Housing Allowance: AED {housing_allowance}", ln=True)
-        pdf.cell(200, 10, txt=f"Transportation Allowance: AED {transportation_allowance}", ln=True)
-        pdf.cell(200, 10, txt=f"Advance Salary Deducted: AED {advance_salary_deducted}", ln=True)
-        pdf.cell(200, 10, txt=f"Deductions: AED {deductions}", ln=True)
-        pdf.cell(200, 10, txt=f"Reason for Deduction: {reason}", ln=True)
-        pdf.cell(200, 10, txt=f"Total Pay: AED {total_pay}", ln=True)
-        pdf.cell(200, 10, ln=True)
-        pdf.cell(200, 10, txt="Employee Signature: ___________________________", ln=True)
-
-        pdf_filename = f"{name}_salary_slip_{year}_{month}.pdf"
-        pdf.output(os.path.join("data", pdf_filename))
-
-        new_payslip = {'Filename': pdf_filename, 'Employee': name, 'Creation Date': creation_datetime}
+        new_payslip = {'Filename': pdf_filename, 'Employee': name, 'Employee ID': employee_id, 'Creation Date': creation_datetime}
         self.payslips.append(new_payslip)
-        self.save_to_excel('payslips.xlsx', pd.DataFrame(self.payslips))
+        self.store.append_rows('payslips', [new_payslip])
         dialog.accept()
         QMessageBox.information(self, "Success", f"Salary slip for {name} generated successfully!")
 
+    def advance_deductions(self, year, month):
+        # Advances to deduct in the period, per employee ID
+        return pd.Series(self.advance_totals().get((int(year), int(month)), {}), dtype='float64')
+
+    def run_payroll_page(self):
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Run Payroll")
+        layout = QFormLayout(dialog)
+
+        year_entry = QLineEdit(str(datetime.now().year), dialog)
+        layout.addRow("Year", year_entry)
+
+        month_entry = QLineEdit(str(datetime.now().month), dialog)
+        layout.addRow("Month", month_entry)
+
+        run_button = QPushButton("Run Payroll", dialog)
+        run_button.clicked.connect(lambda: self.run_payroll(dialog, year_entry, month_entry))
+        layout.addWidget(run_button)
+
+        dialog.exec_()
+
+    @instrumented
+    def run_payroll(self, dialog, year_entry, month_entry):
+        year = year_entry.text()
+        month = month_entry.text()
+        if not year or not month:
+            QMessageBox.warning(self, "Warning", "Please fill all required fields")
+            return
+        if not (year.isdigit() and month.isdigit()):
+            QMessageBox.warning(self, "Warning", "Year and Month must be numbers")
+            return
+
+        slips = self.compute_payroll(year, month)
+        if not slips:
+            QMessageBox.warning(self, "Warning", "There are no employees to pay")
+            return
+
+        # PDF rendering is CPU bound, so spread it over worker processes
+        with ProcessPoolExecutor(max_workers=min(len(slips), os.cpu_count() or 1)) as executor:
+            filenames = list(executor.map(render_salary_slip, slips))
+
+        creation_datetime = datetime.now().strftime("%Y-%m-%d %H-%M-%S")
+        new_payslips = [
+            {'Filename': filename, 'Employee': slip['Name'], 'Employee ID': slip['Employee ID'], 'Creation Date': creation_datetime}
+            for filename, slip in zip(filenames, slips)
+        ]
+        self.payslips.extend(new_payslips)
+        self.store.append_rows('payslips', new_payslips)
+        dialog.accept()
+        QMessageBox.information(self, "Success", f"Generated {len(new_payslips)} salary slips for {year}-{month}.")
+
+    def compute_payroll(self, year, month):
+        # Net pay for every employee in one vectorized pass
+        payroll = self.employees[['Name', 'Designation', 'Basic Pay', 'Housing Allowance', 'Transportation Allowance']].copy()
+        payroll['Employee ID'] = payroll.index
+        payroll['Year'] = year
+        payroll['Month'] = month
+        payroll['Advance Salary Deducted'] = self.advance_deductions(year, month).reindex(payroll.index, fill_value=0.0)
+        payroll['Deductions'] = 0.0
+        payroll['Reason'] = ''
+        payroll['Total Pay'] = (
+            payroll['Basic Pay'] + payroll['Housing Allowance'] + payroll['Transportation Allowance']
+            - payroll['Deductions'] - payroll['Advance Salary Deducted']
+        )
+        payroll['Designation'] = payroll['Designation'].astype(str)
+        return payroll.to_dict('records')
+
     def generate_advance_salary_slip_page(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("Generate Advance Salary Slip")
         layout = QFormLayout(dialog)
 
-        employee_combobox = QComboBox(dialog)
-        employee_combobox.addItems(self.employees['Name'].tolist())
+        employee_combobox = self.create_employee_combobox(dialog)
         layout.addRow("Select Employee", employee_combobox)
 
         advance_amount_entry = QLineEdit(dialog)
         layout.addRow("Advance Amount", advance_amount_entry)
 
+        # The payroll period the advance is deducted from
+        year_entry = QLineEdit(str(datetime.now().year), dialog)
+        layout.addRow("Deduct in Year", year_entry)
+
+        month_entry = QLineEdit(str(datetime.now().month), dialog)
+        layout.addRow("Deduct in Month", month_entry)
+
         generate_button = QPushButton("Generate Advance Salary Slip", dialog)
-        generate_button.clicked.connect(lambda: self.generate_advance_slip(dialog, employee_combobox, advance_amount_entry))
+        generate_button.clicked.connect(lambda: self.generate_advance_slip(dialog, employee_combobox, advance_amount_entry, year_entry, month_entry))
         layout.addWidget(generate_button)
 
         dialog.exec_()
 
-    def generate_advance_slip(self, dialog, employee_combobox, advance_amount_entry):
-        selected_employee_name = employee_combobox.currentText()
+    @instrumented
+    def generate_advance_slip(self, dialog, employee_combobox, advance_amount_entry, year_entry, month_entry):
+        employee_id = self.selected_employee_id(employee_combobox)
         advance_amount = advance_amount_entry.text()
+        year = year_entry.text()
+        month = month_entry.text()
 
-        if not selected_employee_name or not advance_amount:
+        if employee_id is None or not advance_amount or not year or not month:
             QMessageBox.warning(self, "Warning", "Please fill all required fields")
             return
+        if not (year.isdigit() and month.isdigit()):
+            QMessageBox.warning(self, "Warning", "Year and Month must be numbers")
+            return
 
-        selected_employee = self.employees[self.employees['Name'] == selected_employee_name].iloc[0]
-        name = selected_employee['Name']
+        name = self.employees.at[employee_id, 'Name']
         advance_amount = float(advance_amount)
         creation_datetime = datetime.now().strftime("%Y-%m-%d %H-%M-%S")
 
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-
-        logo_path = os.path.join("data", "company_logo.png")
-        if os.path.exists(logo_path):
-            pdf.image(logo_path, x=10, y=8, w=50)
-
-        pdf.cell(200, 10, txt="Advance Salary Slip", ln=True, align='C')
-        pdf.cell(200, 10, txt="YouFish2Go Restaurant Co L.L.C", ln=True, align='C')
-        pdf.cell(200, 10, txt="Al Rayees Shopping Center Shop No : 07", ln=True, align='C')
-        pdf.cell(200, 10, txt="Landline: 042718736", ln=True, align='C')
-        pdf.cell(200, 10, txt=f"Name: {name}", ln=True)
-        pdf.cell(200, 10, txt=f"Advance Amount: AED {advance_amount}", ln=True)
-
-        pdf_filename = f"{name}_advance_salary_slip_{creation_datetime}.pdf"
-        pdf.output(os.path.join("data", pdf_filename))
-        new_advance_slip = {'Filename': pdf_filename, 'Employee': name, 'Creation Date': creation_datetime}
-        self.advance_salaries.append(new_advance_slip)
-        self.save_to_excel('advance_salaries.xlsx', pd.DataFrame(self.advance_salaries))
+        pdf_filename = slip_renderer.render(
+            'advance', {'Name': name, 'Advance Amount': advance_amount, 'Year': year, 'Month': month},
+            f"{name}_advance_salary_slip_{creation_datetime}.pdf"
+        )
+        new_advance_slip = {
+            'Filename': pdf_filename, 'Employee': name, 'Employee ID': employee_id, 'Creation Date': creation_datetime,
+            'Year': int(year), 'Month': int(month), 'Advance Salary': advance_amount,
+        }
+        self.append_rows('advance_salaries', [new_advance_slip])
         dialog.accept()
         QMessageBox.information(self, "Success", f"Advance salary slip for {name} generated successfully!")
 
+    @instrumented
     def list_generated_advance_salaries(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("List of Generated Advance Salary Slips")
         layout = QVBoxLayout(dialog)
 
-        table = QTableWidget(len(self.advance_salaries), 3, self)
-        table.setHorizontalHeaderLabels(['Filename', 'Employee', 'Creation Date'])
-        for i, slip in enumerate(self.advance_salaries):
-            table.setItem(i, 0, QTableWidgetItem(slip['Filename']))
-            table.setItem(i, 1, QTableWidgetItem(slip['Employee']))
-            table.setItem(i, 2, QTableWidgetItem(slip['Creation Date']))
-
-        layout.addWidget(table)
+        self.create_table_view(dialog, layout, self.advance_salaries)
         dialog.exec_()
 
+    @instrumented
     def list_generated_payslips(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("List of Generated Payslips")
         layout = QVBoxLayout(dialog)
 
-        table = QTableWidget(len(self.payslips), 3, self)
-        table.setHorizontalHeaderLabels(['Filename', 'Employee', 'Creation Date'])
-        for i, slip in enumerate(self.payslips):
-            table.setItem(i, 0, QTableWidgetItem(slip['Filename']))
-            table.setItem(i, 1, QTableWidgetItem(slip['Employee']))
-            table.setItem(i, 2, QTableWidgetItem(slip['Creation Date']))
-
-        layout.addWidget(table)
+        self.create_table_view(dialog, layout, pd.DataFrame(self.payslips, columns=list(TABLE_SCHEMAS['payslips'])))
         dialog.exec_()
 
     def add_sales(self):
@@ -597,6 +2405,7 @@ class YouFish2GoRestaurantCoLLC(QMainWindow):
 
         dialog.exec_()
 
+    @instrumented
     def save_sales(self, dialog, sales_date_entry, cash_sales_entry, credit_sales_entry):
         sales_date = sales_date_entry.date().toString("yyyy-MM-dd")
         cash_sales_amount = float(cash_sales_entry.text() or 0)
@@ -605,8 +2414,7 @@ class YouFish2GoRestaurantCoLLC(QMainWindow):
         new_cash_sales = {'Date': sales_date, 'Amount': cash_sales_amount, 'Type': 'Cash'}
         new_credit_sales = {'Date': sales_date, 'Amount': credit_sales_amount, 'Type': 'Credit Card'}
 
-        self.sales = pd.concat([self.sales, pd.DataFrame([new_cash_sales, new_credit_sales])], ignore_index=True)
-        self.save_to_excel('sales.xlsx', self.sales)
+        self.append_rows('sales', [new_cash_sales, new_credit_sales])
         dialog.accept()
         QMessageBox.information(self, "Success", "Sales entry saved successfully!")
 
@@ -632,14 +2440,14 @@ class YouFish2GoRestaurantCoLLC(QMainWindow):
 
         dialog.exec_()
 
+    @instrumented
     def save_expense(self, dialog, expense_date_entry, expense_amount_entry, expense_category_combobox):
         expense_date = expense_date_entry.date().toString("yyyy-MM-dd")
         expense_amount = float(expense_amount_entry.text() or 0)
         expense_category_value = expense_category_combobox.currentText()
 
         new_expense = {'Date': expense_date, 'Amount': expense_amount, 'Category': expense_category_value}
-        self.expenses = pd.concat([self.expenses, pd.DataFrame([new_expense])], ignore_index=True)
-        self.save_to_excel('expenses.xlsx', self.expenses)
+        self.append_rows('expenses', [new_expense])
         dialog.accept()
         QMessageBox.information(self, "Success", "Expense entry saved successfully!")
 
@@ -671,6 +2479,7 @@ class YouFish2GoRestaurantCoLLC(QMainWindow):
 
         dialog.exec_()
 
+    @instrumented
     def save_purchase(self, dialog, purchase_date_entry, company_entry, payment_type_combobox, amount_entry, invoice_entry):
         purchase_date = purchase_date_entry.date().toString("yyyy-MM-dd")
         company_name = company_entry.text()
@@ -679,174 +2488,130 @@ class YouFish2GoRestaurantCoLLC(QMainWindow):
         invoice_number = invoice_entry.text()
 
         new_purchase = {'Date': purchase_date, 'Company': company_name, 'Payment Type': payment_type_value, 'Amount': amount, 'Invoice Number': invoice_number, 'Remaining Balance': amount}
-        self.purchases = pd.concat([self.purchases, pd.DataFrame([new_purchase])], ignore_index=True)
-        self.save_to_excel('purchases.xlsx', self.purchases)
+        # The purchase and its expense or payable are committed together
+        with self.store.unit_of_work():
+            self.append_rows('purchases', [new_purchase])
+
+            if payment_type_value == "Cash":
+                new_expense = {'Date': purchase_date, 'Amount': amount, 'Category': f'Purchase from {company_name}'}
+                self.append_rows('expenses', [new_expense])
+            else:
+                new_account_payable = {'Date': purchase_date, 'Company': company_name, 'Amount': amount, 'Invoice Number': invoice_number, 'Remaining Balance': amount}
+                self.append_rows('accounts_payable', [new_account_payable])
 
         if payment_type_value == "Cash":
-            new_expense = {'Date': purchase_date, 'Amount': amount, 'Category': f'Purchase from {company_name}'}
-            self.expenses = pd.concat([self.expenses, pd.DataFrame([new_expense])], ignore_index=True)
-            self.save_to_excel('expenses.xlsx', self.expenses)
             self.generate_payment_slip(company_name, amount, amount)
-        else:
-            new_account_payable = {'Date': purchase_date, 'Company': company_name, 'Amount': amount, 'Invoice Number': invoice_number, 'Remaining Balance': amount}
-            self.accounts_payable = pd.concat([self.accounts_payable, pd.DataFrame([new_account_payable])], ignore_index=True)
-            self.save_to_excel('accounts_payable.xlsx', self.accounts_payable)
 
         dialog.accept()
         QMessageBox.information(self, "Success", "Purchase entry saved successfully!")
 
+    @instrumented
     def daily_sales_report(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("Daily Sales Report")
         layout = QVBoxLayout(dialog)
 
-        table = QTableWidget(self)
-        layout.addWidget(table)
-
-        today = datetime.now().strftime("%Y-%m-%d")
-        daily_sales = self.sales[self.sales['Date'] == today]
-
-        table.setRowCount(daily_sales.shape[0])
-        table.setColumnCount(daily_sales.shape[1])
-        table.setHorizontalHeaderLabels(daily_sales.columns)
-        for i in range(daily_sales.shape[0]):
-            for j in range(daily_sales.shape[1]):
-                table.setItem(i, j, QTableWidgetItem(str(daily_sales.iat[i, j])))
+        today = pd.Timestamp.today().normalize()
+        daily_sales = self.ledger_table('sales').between(today, today)
 
+        self.create_table_view(dialog, layout, daily_sales)
         dialog.exec_()
 
+    @instrumented
     def daily_expense_report(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("Daily Expense Report")
         layout = QVBoxLayout(dialog)
 
-        table = QTableWidget(self)
-        layout.addWidget(table)
-
-        today = datetime.now().strftime("%Y-%m-%d")
-        daily_expenses = self.expenses[self.expenses['Date'] == today]
-
-        table.setRowCount(daily_expenses.shape[0])
-        table.setColumnCount(daily_expenses.shape[1])
-        table.setHorizontalHeaderLabels(daily_expenses.columns)
-        for i in range(daily_expenses.shape[0]):
-            for j in range(daily_expenses.shape[1]):
-                table.setItem(i, j, QTableWidgetItem(str(daily_expenses.iat[i, j])))
+        today = pd.Timestamp.today().normalize()
+        daily_expenses = self.ledger_table('expenses').between(today, today)
 
+        self.create_table_view(dialog, layout, daily_expenses)
         dialog.exec_()
 
+    @instrumented
     def daily_purchase_report(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("Daily Purchase Report")
         layout = QVBoxLayout(dialog)
 
-        table = QTableWidget(self)
-        layout.addWidget(table)
-
-        today = datetime.now().strftime("%Y-%m-%d")
-        daily_purchases = self.purchases[self.purchases['Date'] == today]
-
-        table.setRowCount(daily_purchases.shape[0])
-        table.setColumnCount(daily_purchases.shape[1])
-        table.setHorizontalHeaderLabels(daily_purchases.columns)
-        for i in range(daily_purchases.shape[0]):
-            for j in range(daily_purchases.shape[1]):
-                table.setItem(i, j, QTableWidgetItem(str(daily_purchases.iat(i, j))))
+        today = pd.Timestamp.today().normalize()
+        daily_purchases = self.ledger_table('purchases').between(today, today)
 
+        self.create_table_view(dialog, layout, daily_purchases)
         dialog.exec_()
 
+    @instrumented
     def list_accounts_payable(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("Accounts Payable")
         layout = QVBoxLayout(dialog)
 
-        table = QTableWidget(self.accounts_payable.shape[0], self.accounts_payable.shape[1], self)
-        table.setHorizontalHeaderLabels(self.accounts_payable.columns)
-        for i in range(self.accounts_payable.shape[0]):
-            for j in range(self.accounts_payable.shape[1]):
-                table.setItem(i, j, QTableWidgetItem(str(self.accounts_payable.iat[i, j])))
+        layout.addWidget(QLabel("Balance by vendor and invoice age (days)", dialog))
+        vendor_view = QTableView(dialog)
+        vendor_view.setModel(DataFrameModel(self.vendor_aging(), dialog))
+        layout.addWidget(vendor_view)
 
-        layout.addWidget(table)
+        view, model = self.create_table_view(dialog, layout, self.accounts_payable)
 
+        @instrumented
         def mark_as_paid():
-            selected_items = table.selectedItems()
-            if not selected_items:
+            selected_indexes = view.selectionModel().selectedIndexes()
+            if not selected_indexes:
                 QMessageBox.warning(self, "Warning", "Please select an item to mark as paid")
                 return
 
-            row = selected_items[0].row()
-            values = [table.item(row, col).text() for col in range(table.columnCount() - 1)]  # Exclude the Remaining Balance column
-
-            print("Selected values:", values)  # Debugging print
-
-            date_val, company_val, amount_val, invoice_val = values
-            # Convert date_val to datetime format for comparison
-            try:
-                date_val = pd.to_datetime(date_val).date()
-            except Exception as e:
-                print(f"Error converting date: {e}")
-
-            print(f"Converted Date: {date_val}")  # Debugging print
-            print(f"DataFrame Dates: {pd.to_datetime(self.accounts_payable['Date']).dt.date}")  # Debugging print
-            print(f"DataFrame Invoice Numbers: {self.accounts_payable['Invoice Number']}")  # Debugging print
-
-            # Compare each field individually and print the results
-            date_match = (pd.to_datetime(self.accounts_payable['Date']).dt.date == date_val)
-            company_match = (self.accounts_payable['Company'] == company_val)
-            amount_match = (self.accounts_payable['Amount'].astype(str) == amount_val)
-            invoice_match = (self.accounts_payable['Invoice Number'].astype(str).str.strip() == invoice_val)
-
-            print(f"Date Match: {date_match}")
-            print(f"Company Match: {company_match}")
-            print(f"Amount Match: {amount_match}")
-            print(f"Invoice Match: {invoice_match}")
-
-            matching_rows = self.accounts_payable[date_match & company_match & amount_match & invoice_match]
-
-            print("Matching rows:", matching_rows)  # Debugging print
-
-            if not matching_rows.empty:
-                index = matching_rows.index[0]
-                remaining_balance = self.accounts_payable.at[index, 'Remaining Balance']
-
-                payment_dialog = QDialog(self)
-                payment_dialog.setWindowTitle("Mark as Paid")
-                payment_layout = QFormLayout(payment_dialog)
-
-                payment_layout.addRow(QLabel(f"Company: {values[1]}"))
-                payment_layout.addRow(QLabel(f"Total Amount: AED {values[2]}"))
-                payment_layout.addRow(QLabel(f"Remaining Balance: AED {remaining_balance}"))
-
-                payment_amount_entry = QLineEdit(payment_dialog)
-                payment_layout.addRow("Payment Amount", payment_amount_entry)
-
-                def confirm_payment():
-                    payment_amount = float(payment_amount_entry.text() or 0)
-                    if payment_amount > remaining_balance:
-                        QMessageBox.critical(self, "Error", "Payment amount exceeds remaining balance.")
-                        return
+            row = selected_indexes[0].row()
+            key = model.row_label(row)
+            if key not in self.accounts_payable.index:
+                QMessageBox.critical(self, "Error", "No matching entry found to mark as paid.")
+                return
 
-                    new_balance = remaining_balance - payment_amount
+            payable = self.accounts_payable.loc[key]
+            company = payable['Company']
+            total_amount = payable['Amount']
+            remaining_balance = payable['Remaining Balance']
+
+            payment_dialog = QDialog(self)
+            payment_dialog.setWindowTitle("Mark as Paid")
+            payment_layout = QFormLayout(payment_dialog)
+
+            payment_layout.addRow(QLabel(f"Company: {company}"))
+            payment_layout.addRow(QLabel(f"Total Amount: AED {total_amount}"))
+            payment_layout.addRow(QLabel(f"Remaining Balance: AED {remaining_balance}"))
+
+            payment_amount_entry = QLineEdit(payment_dialog)
+            payment_layout.addRow("Payment Amount", payment_amount_entry)
+
+            @instrumented
+            def confirm_payment():
+                payment_amount = float(payment_amount_entry.text() or 0)
+                if payment_amount > remaining_balance:
+                    QMessageBox.critical(self, "Error", "Payment amount exceeds remaining balance.")
+                    return
+
+                new_balance = remaining_balance - payment_amount
+                with self.store.unit_of_work():
+                    # Payments are kept as events, so a vendor's history survives its invoices being settled
+                    payment = {'Date': datetime.now().strftime("%Y-%m-%d"), 'Payable ID': key, 'Company': company, 'Invoice Number': payable['Invoice Number'], 'Amount': payment_amount}
+                    self.append_rows('payable_payments', [payment])
                     if new_balance == 0:
-                        self.accounts_payable = self.accounts_payable.drop(index)
+                        self.drop_rows('accounts_payable', [key])
                     else:
-                        self.accounts_payable.at[index, 'Remaining Balance'] = new_balance
+                        self.set_value('accounts_payable', key, 'Remaining Balance', new_balance)
+                    self.add_expense_from_payment(company, payment_amount)
 
-                    table.removeRow(row)
-                    self.add_expense_from_payment(values[1], payment_amount)
-                    self.save_to_excel('accounts_payable.xlsx', self.accounts_payable)
-                    self.generate_payment_slip(values[1], values[2], new_balance)
-                    QMessageBox.information(self, "Success", "Marked as paid and expense recorded.")
-                    payment_dialog.accept()
+                model.remove_row(row)
+                vendor_view.setModel(DataFrameModel(self.vendor_aging(), dialog))
+                self.generate_payment_slip(company, total_amount, new_balance)
+                QMessageBox.information(self, "Success", "Marked as paid and expense recorded.")
+                payment_dialog.accept()
 
-                confirm_button = QPushButton("Confirm Payment", payment_dialog)
-                confirm_button.clicked.connect(confirm_payment)
-                payment_layout.addWidget(confirm_button)
+            confirm_button = QPushButton("Confirm Payment", payment_dialog)
+            confirm_button.clicked.connect(confirm_payment)
+            payment_layout.addWidget(confirm_button)
 
-                payment_dialog.exec_()
-
-            else:
-                QMessageBox.critical(self, "Error", "No matching entry found to mark as paid.")
+            payment_dialog.exec_()
 
         mark_as_paid_button = QPushButton("Mark as Paid", self)
         mark_as_paid_button.clicked.connect(mark_as_paid)
@@ -854,38 +2619,26 @@ class YouFish2GoRestaurantCoLLC(QMainWindow):
 
         dialog.exec_()
 
+    @instrumented
     def list_accounts_receivable(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("Accounts Receivable")
         layout = QVBoxLayout(dialog)
 
-        table = QTableWidget(self.accounts_receivable.shape[0], self.accounts_receivable.shape[1], self)
-        table.setHorizontalHeaderLabels(self.accounts_receivable.columns)
-        for i in range(self.accounts_receivable.shape[0]):
-            for j in range(self.accounts_receivable.shape[1]):
-                table.setItem(i, j, QTableWidgetItem(str(self.accounts_receivable.iat(i, j))))
-
-        layout.addWidget(table)
+        view, model = self.create_table_view(dialog, layout, self.accounts_receivable)
 
+        @instrumented
         def mark_as_paid():
-            selected_items = table.selectedItems()
-            if not selected_items:
+            selected_indexes = view.selectionModel().selectedIndexes()
+            if not selected_indexes:
                 QMessageBox.warning(self, "Warning", "Please select an item to mark as paid")
                 return
 
-            row = selected_items[0].row()
-            values = [table.item(row, col).text() for col in range(table.columnCount())]
-
-            matching_rows = self.accounts_receivable[
-                (self.accounts_receivable['Date'] == values[0]) &
-                (self.accounts_receivable['Customer'] == values[1]) &
-                (self.accounts_receivable['Amount'] == float(values[2]))
-            ]
-            if not matching_rows.empty:
-                index = matching_rows.index[0]
-                self.accounts_receivable = self.accounts_receivable.drop(index)
-                table.removeRow(row)
-                self.save_to_excel('accounts_receivable.xlsx', self.accounts_receivable)
+            row = selected_indexes[0].row()
+            key = model.row_label(row)
+            if key in self.accounts_receivable.index:
+                self.drop_rows('accounts_receivable', [key])
+                model.remove_row(row)
                 QMessageBox.information(self, "Success", "Marked as paid.")
             else:
                 QMessageBox.critical(self, "Error", "No matching entry found to mark as paid.")
@@ -899,30 +2652,14 @@ class YouFish2GoRestaurantCoLLC(QMainWindow):
     def add_expense_from_payment(self, company, amount):
         today = datetime.now().strftime("%Y-%m-%d")
         new_expense = {'Date': today, 'Amount': amount, 'Category': f'Payment to {company}'}
-        self.expenses = pd.concat([self.expenses, pd.DataFrame([new_expense])], ignore_index=True)
-        self.save_to_excel('expenses.xlsx', self.expenses)
+        self.append_rows('expenses', [new_expense])
 
     def generate_payment_slip(self, company, total_amount, remaining_balance):
         creation_datetime = datetime.now().strftime("%Y-%m-%d %H-%M-%S")
-
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-
-        logo_path = os.path.join("data", "company_logo.png")
-        if os.path.exists(logo_path):
-            pdf.image(logo_path, x=10, y=8, w=50)
-
-        pdf.cell(200, 10, txt="Payment Slip", ln=True, align='C')
-        pdf.cell(200, 10, txt="YouFish2Go Restaurant Co L.L.C", ln=True, align='C')
-        pdf.cell(200, 10, txt="Al Rayees Shopping Center Shop No : 07", ln=True, align='C')
-        pdf.cell(200, 10, txt="Landline: 042718736", ln=True, align='C')
-        pdf.cell(200, 10, txt=f"Company: {company}", ln=True)
-        pdf.cell(200, 10, txt=f"Total Amount: AED {total_amount}", ln=True)
-        pdf.cell(200, 10, txt=f"Remaining Balance: AED {remaining_balance}", ln=True)
-
-        pdf_filename = f"{company}_payment_slip_{creation_datetime}.pdf"
-        pdf.output(os.path.join("data", pdf_filename))
+        slip_renderer.render(
+            'payment', {'Company': company, 'Total Amount': total_amount, 'Remaining Balance': remaining_balance},
+            f"{company}_payment_slip_{creation_datetime}.pdf"
+        )
 
     def generate_custom_sales_report(self):
         dialog = QDialog(self)
@@ -943,27 +2680,22 @@ class YouFish2GoRestaurantCoLLC(QMainWindow):
 
         dialog.exec_()
 
+    @instrumented
     def generate_sales_report(self, dialog, start_date_entry, end_date_entry):
-        start_date = start_date_entry.date().toString("yyyy-MM-dd")
-        end_date = end_date_entry.date().toString("yyyy-MM-dd")
-
-        report_data = self.sales[(self.sales['Date'] >= start_date) & (self.sales['Date'] <= end_date)]
+        start_date = pd.Timestamp(start_date_entry.date().toPyDate())
+        end_date = pd.Timestamp(end_date_entry.date().toPyDate())
 
-        fig, ax = plt.subplots()
-        report_data.groupby('Type').sum()['Amount'].plot(kind='bar', ax=ax)
-        ax.set_title('Sales Report')
-        ax.set_xlabel('Type')
-        ax.set_ylabel('Amount')
-        ax.grid(True)
+        report_data = pd.Series(self.rollup('sales').between(start_date, end_date), dtype='float64').sort_index()
 
-        canvas = FigureCanvas(fig)
-        canvas.draw()
+        def draw(figure):
+            ax = figure.add_subplot()
+            ax.bar(report_data.index.astype(str), report_data.values)
+            ax.set_title('Sales Report')
+            ax.set_xlabel('Type')
+            ax.set_ylabel('Amount')
+            ax.grid(True)
 
-        report_dialog = QDialog(self)
-        report_dialog.setWindowTitle("Sales Report")
-        report_layout = QVBoxLayout(report_dialog)
-        report_layout.addWidget(canvas)
-        report_dialog.exec_()
+        self.show_chart("Sales Report", ('sales', start_date, end_date, self.revision('sales')), draw)
 
     def generate_custom_expense_report(self):
         dialog = QDialog(self)
@@ -984,27 +2716,22 @@ class YouFish2GoRestaurantCoLLC(QMainWindow):
 
         dialog.exec_()
 
+    @instrumented
     def generate_expense_report(self, dialog, start_date_entry, end_date_entry):
-        start_date = start_date_entry.date().toString("yyyy-MM-dd")
-        end_date = end_date_entry.date().toString("yyyy-MM-dd")
+        start_date = pd.Timestamp(start_date_entry.date().toPyDate())
+        end_date = pd.Timestamp(end_date_entry.date().toPyDate())
 
-        report_data = self.expenses[(self.expenses['Date'] >= start_date) & (self.expenses['Date'] <= end_date)]
+        report_data = pd.Series(self.rollup('expenses').between(start_date, end_date), dtype='float64').sort_index()
 
-        fig, ax = plt.subplots()
-        report_data.groupby('Category').sum()['Amount'].plot(kind='bar', ax=ax)
-        ax.set_title('Expense Report')
-        ax.set_xlabel('Category')
-        ax.set_ylabel('Amount')
-        ax.grid(True)
+        def draw(figure):
+            ax = figure.add_subplot()
+            ax.bar(report_data.index.astype(str), report_data.values)
+            ax.set_title('Expense Report')
+            ax.set_xlabel('Category')
+            ax.set_ylabel('Amount')
+            ax.grid(True)
 
-        canvas = FigureCanvas(fig)
-        canvas.draw()
-
-        report_dialog = QDialog(self)
-        report_dialog.setWindowTitle("Expense Report")
-        report_layout = QVBoxLayout(report_dialog)
-        report_layout.addWidget(canvas)
-        report_dialog.exec_()
+        self.show_chart("Expense Report", ('expenses', start_date, end_date, self.revision('expenses')), draw)
 
     def generate_custom_profit_loss_report(self):
         dialog = QDialog(self)
@@ -1025,40 +2752,34 @@ class YouFish2GoRestaurantCoLLC(QMainWindow):
 
         dialog.exec_()
 
+    @instrumented
     def generate_profit_loss_report(self, dialog, start_date_entry, end_date_entry):
-        start_date = start_date_entry.date().toString("yyyy-MM-dd")
-        end_date = end_date_entry.date().toString("yyyy-MM-dd")
-
-        sales_data = self.sales[(self.sales['Date'] >= start_date) & (self.sales['Date'] <= end_date)]
-        expense_data = self.expenses[(self.expenses['Date'] >= start_date) & (self.expenses['Date'] <= end_date)]
+        start_date = pd.Timestamp(start_date_entry.date().toPyDate())
+        end_date = pd.Timestamp(end_date_entry.date().toPyDate())
 
-        total_sales = sales_data['Amount'].sum()
-        total_expenses = expense_data['Amount'].sum()
+        total_sales = sum(self.rollup('sales').between(start_date, end_date).values())
+        total_expenses = sum(self.rollup('expenses').between(start_date, end_date).values())
         profit_loss = total_sales - total_expenses
 
-        fig, ax = plt.subplots()
-        ax.bar(['Total Sales', 'Total Expenses', 'Profit/Loss'], [total_sales, total_expenses, profit_loss])
-        ax.set_title('Profit and Loss Report')
-        ax.set_xlabel('Category')
-        ax.set_ylabel('Amount')
-        ax.grid(True)
+        def draw(figure):
+            ax = figure.add_subplot()
+            ax.bar(['Total Sales', 'Total Expenses', 'Profit/Loss'], [total_sales, total_expenses, profit_loss])
+            ax.set_title('Profit and Loss Report')
+            ax.set_xlabel('Category')
+            ax.set_ylabel('Amount')
+            ax.grid(True)
 
-        canvas = FigureCanvas(fig)
-        canvas.draw()
-
-        report_dialog = QDialog(self)
-        report_dialog.setWindowTitle("Profit and Loss Report")
-        report_layout = QVBoxLayout(report_dialog)
-        report_layout.addWidget(canvas)
-        report_dialog.exec_()
+        key = ('profit_loss', start_date, end_date, self.revision('sales'), self.revision('expenses'))
+        self.show_chart("Profit and Loss Report", key, draw)
 
+    @instrumented
     def profit_loss_statement(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("Profit and Loss Statement")
         layout = QVBoxLayout(dialog)
 
-        total_sales = self.sales['Amount'].sum()
-        total_expenses = self.expenses['Amount'].sum()
+        total_sales = self.table_total('sales')
+        total_expenses = self.table_total('expenses')
         profit_loss = total_sales - total_expenses
 
         layout.addWidget(QLabel(f"Total Sales: AED {total_sales}"))
@@ -1067,16 +2788,17 @@ class YouFish2GoRestaurantCoLLC(QMainWindow):
 
         dialog.exec_()
 
+    @instrumented
     def create_dashboard(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("Dashboard")
         layout = QVBoxLayout(dialog)
 
-        total_sales = self.sales['Amount'].sum()
-        total_expenses = self.expenses['Amount'].sum()
-        total_purchases = self.purchases['Amount'].sum()
-        total_accounts_payable = self.accounts_payable['Amount'].sum()
-        total_accounts_receivable = self.accounts_receivable['Amount'].sum()
+        total_sales = self.table_total('sales')
+        total_expenses = self.table_total('expenses')
+        total_purchases = self.table_total('purchases')
+        total_accounts_payable = self.table_total('accounts_payable')
+        total_accounts_receivable = self.table_total('accounts_receivable')
 
         layout.addWidget(QLabel(f"Total Sales: AED {total_sales}"))
         layout.addWidget(QLabel(f"Total Expenses: AED {total_expenses}"))
@@ -1086,8 +2808,250 @@ class YouFish2GoRestaurantCoLLC(QMainWindow):
 
         dialog.exec_()
 
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = YouFish2GoRestaurantCoLLC()
+IMPORT_CHUNK_SIZE = 10000
+
+
+def read_chunks(path, chunksize):
+    # Streams a CSV or XLSX file as DataFrames of at most chunksize rows, with the values as read so
+    # they can be validated before the schema coerces them
+    if path.lower().endswith(('.xlsx', '.xlsm')):
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(cell).strip() if cell is not None else '' for cell in next(rows, ())]
+            chunk = []
+            for row in rows:
+                chunk.append(row[:len(header)])
+                if len(chunk) == chunksize:
+                    yield pd.DataFrame(chunk, columns=header)
+                    chunk = []
+            if chunk:
+                yield pd.DataFrame(chunk, columns=header)
+        finally:
+            workbook.close()
+    else:
+        for chunk in pd.read_csv(path, chunksize=chunksize, dtype=str, keep_default_na=False):
+            yield chunk.rename(columns=str.strip)
+
+
+def row_hashes(df, columns):
+    # Equal rows hash equal whatever their datetime resolution or category set
+    normalized = pd.DataFrame({
+        column: df[column].astype('datetime64[ns]') if pd.api.types.is_datetime64_any_dtype(df[column])
+        else df[column].astype(object) if isinstance(df[column].dtype, pd.CategoricalDtype) else df[column]
+        for column in columns
+    })
+    return pd.util.hash_pandas_object(normalized, index=False)
+
+
+def import_file(store, table, path, chunksize=IMPORT_CHUNK_SIZE):
+    # Bulk-imports a CSV/XLSX export into a ledger table without the GUI. Rows are checked against the
+    # table schema (dates must parse, money columns must be numeric). Duplicates are counted as a multiset:
+    # the n-th copy of a row in the file is skipped if the table already holds n copies, so re-importing
+    # or overlapping exports add nothing while genuinely repeated lines are kept. Every chunk goes into
+    # one unit of work, so the import commits once.
+    if table not in TABLE_SCHEMAS or table in RECORD_TABLES:
+        raise ValueError(f"Cannot import into {table}")
+    schema = TABLE_SCHEMAS[table]
+    key_column = KEY_COLUMNS.get(table)
+    columns = [column for column in schema if column != key_column]
+
+    table_counts = pd.Series(dtype='int64')
+    if store.has_table(table):
+        # Streamed, so only the hash counts of the existing rows are held, not the rows
+        for existing in store.read_chunks(table, chunksize=chunksize):
+            existing = apply_schema(existing.reindex(columns=list(schema)), table)
+            table_counts = table_counts.add(row_hashes(existing, columns).value_counts(), fill_value=0)
+    file_counts = pd.Series(dtype='int64')
+
+    summary = {'imported': 0, 'duplicates': 0, 'invalid': 0}
+    with store.unit_of_work():
+        for chunk in read_chunks(path, chunksize):
+            missing = [column for column in columns if column not in chunk.columns]
+            if missing:
+                raise ValueError(f"{path} is missing columns: {', '.join(missing)}")
+            typed = apply_schema(chunk.reindex(columns=list(schema)), table)
+
+            valid = pd.Series(True, index=chunk.index)
+            for column in columns:
+                if schema[column] == 'date':
+                    valid &= typed[column].notna()
+                elif schema[column] == 'money':
+                    blank = chunk[column].isna() | (chunk[column].astype(str).str.strip() == '')
+                    valid &= blank | pd.to_numeric(chunk[column], errors='coerce').notna()
+
+            hashes = row_hashes(typed, columns)[valid]
+            occurrence = hashes.groupby(hashes).cumcount() + 1 + hashes.map(file_counts).fillna(0)
+            fresh = occurrence > hashes.map(table_counts).fillna(0)
+            file_counts = file_counts.add(hashes.value_counts(), fill_value=0)
+            new_rows = typed.loc[fresh.index[fresh]]
+            if key_column:
+                new_rows[key_column] = [new_key() for _ in range(len(new_rows))]
+            store.append_rows(table, new_rows)
+
+            summary['imported'] += len(new_rows)
+            summary['duplicates'] += int((~fresh).sum())
+            summary['invalid'] += int((~valid).sum())
+    store.flush()
+    return summary
+
+
+def export_chunks(store, table, start=None, end=None, chunksize=EXPORT_CHUNK_SIZE):
+    # Typed chunks of the table; categories become plain strings so every chunk has the same column types
+    for chunk in store.read_chunks(table, start, end, chunksize):
+        if table in TABLE_SCHEMAS:
+            chunk = apply_schema(chunk.reindex(columns=list(TABLE_SCHEMAS[table])), table)
+            chunk = chunk.astype({column: str for column, kind in TABLE_SCHEMAS[table].items() if kind == 'category'})
+        yield chunk
+
+
+def write_csv(chunks, path):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        header = True
+        for chunk in chunks:
+            chunk.to_csv(f, header=header, index=False)
+            header = False
+
+
+def write_parquet(chunks, path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    writer = None
+    try:
+        for chunk in chunks:
+            batch = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema)
+            writer.write_table(batch.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_xlsx(chunks, path):
+    from openpyxl import Workbook
+    # Write-only mode streams rows to disk instead of building the sheet in memory
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    header = True
+    for chunk in chunks:
+        if header:
+            sheet.append([str(column) for column in chunk.columns])
+            header = False
+        values = chunk.astype(object)
+        for row in values.where(values.notna(), None).itertuples(index=False, name=None):
+            sheet.append(row)
+    workbook.save(path)
+
+
+EXPORT_WRITERS = {'.csv': write_csv, '.parquet': write_parquet, '.xlsx': write_xlsx}
+
+
+def export_table(store, table, path, start=None, end=None, chunksize=EXPORT_CHUNK_SIZE):
+    # Streams a table, or the rows dated start through end, to CSV, Parquet or XLSX (chosen by extension),
+    # one chunk at a time; the file is written atomically so a failed export leaves the previous one intact
+    writer = EXPORT_WRITERS.get(os.path.splitext(path)[1].lower())
+    if writer is None:
+        raise ValueError(f"Unsupported export format: {path} (use {', '.join(EXPORT_WRITERS)})")
+    atomic_write(path, lambda temp_path: writer(export_chunks(store, table, start, end, chunksize), temp_path))
+
+
+def open_store(server):
+    return LedgerClient(server) if server else LedgerStore(os.path.join("data", "ledger.db"))
+
+
+def parse_address(text):
+    host, _, port = text.rpartition(':')
+    return (host or '127.0.0.1', int(port))
+
+
+def serve(address):
+    store = LedgerStore(os.path.join("data", "ledger.db"))
+    store.replay_journal()
+    with LedgerServer(store, address) as server:
+        host, port = server.server_address[:2]
+        print(f"Ledger server listening on {host}:{port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            store.close()
+    return 0
+
+
+def print_startup_profile():
+    print(f"{'Startup profile':<52} {'total ms':>9} {'step ms':>9}")
+    started = previous = STARTUP_TIMES[0][1]
+    for stage, moment in STARTUP_TIMES[1:]:
+        print(f"  {stage:<50} {(moment - started) * 1000:9.1f} {(moment - previous) * 1000:9.1f}")
+        previous = moment
+    deferred = [name for name in ('matplotlib', 'fpdf', 'openpyxl') if name not in sys.modules]
+    print(f"  not loaded yet: {', '.join(deferred) or 'none'}")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="ms.py")
+    parser.add_argument('--server', type=parse_address, metavar="HOST:PORT", help="run as a terminal of a ledger server")
+    parser.add_argument('--profile-startup', action='store_true', help="print import and init timings once the window is up, then exit")
+    parser.add_argument('--profile-action', metavar="NAME", help="run the next NAME action (e.g. save_sales, or '*' for any) under cProfile; stats go to data/profiles")
+    commands = parser.add_subparsers(dest='command')
+    serve_parser = commands.add_parser('serve', help="run the ledger server that terminals connect to")
+    serve_parser.add_argument('--address', type=parse_address, default=('127.0.0.1', 8765), metavar="HOST:PORT")
+    import_parser = commands.add_parser('import', help="bulk-import a CSV or XLSX file into a ledger table")
+    import_parser.add_argument('table', choices=[name for name in TABLE_SCHEMAS if name not in RECORD_TABLES])
+    import_parser.add_argument('file')
+    import_parser.add_argument('--chunksize', type=int, default=IMPORT_CHUNK_SIZE)
+    export_parser = commands.add_parser('export', help="export a ledger table to CSV, Parquet or XLSX")
+    export_parser.add_argument('table', choices=list(TABLE_SCHEMAS))
+    export_parser.add_argument('file')
+    export_parser.add_argument('--start', help="first date to include (YYYY-MM-DD)")
+    export_parser.add_argument('--end', help="last date to include (YYYY-MM-DD)")
+    export_parser.add_argument('--chunksize', type=int, default=EXPORT_CHUNK_SIZE)
+    args, qt_args = parser.parse_known_args(argv[1:])
+
+    try:
+        if args.command == 'serve':
+            return serve(args.address)
+        if args.command in ('import', 'export'):
+            store = open_store(args.server)
+    except LedgerLocked as e:
+        print(e)
+        return 1
+    if args.command == 'import':
+        store.replay_journal()
+        summary = import_file(store, args.table, args.file, args.chunksize)
+        print(f"Imported {summary['imported']} rows into {args.table} "
+              f"({summary['duplicates']} duplicates skipped, {summary['invalid']} invalid rows rejected)")
+        return 0
+    if args.command == 'export':
+        store.replay_journal()
+        export_table(store, args.table, args.file, args.start, args.end, args.chunksize)
+        print(f"Exported {args.table} to {args.file}")
+        return 0
+
+    action_profiler.profile_next = args.profile_action
+    app = QApplication(argv[:1] + qt_args)
+    STARTUP_TIMES.append(('create QApplication', time.perf_counter()))
+    try:
+        window = YouFish2GoRestaurantCoLLC(server=args.server)
+    except LedgerLocked as e:
+        QMessageBox.critical(None, "Error", str(e))
+        return 1
     window.show()
-    sys.exit(app.exec_())
+    STARTUP_TIMES.append(('show window', time.perf_counter()))
+    if args.profile_startup:
+        def report():
+            STARTUP_TIMES.append(('first event loop pass', time.perf_counter()))
+            print_startup_profile()
+            app.quit()
+        QTimer.singleShot(0, report)
+    return app.exec_()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
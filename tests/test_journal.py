@@ -0,0 +1,67 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+def crash(store):
+    # Drops the store the way a power cut would: queued writes are only in the journal
+    if store.commit_timer:
+        store.commit_timer.cancel()
+    store.writer.shutdown()
+    store.journal.close()
+    store.conn.close()
+    store.lock_file.close()
+
+
+def sale(ms, day, amount):
+    return ms.apply_schema(pd.DataFrame([{'Date': day, 'Amount': amount, 'Type': 'Cash'}]), 'sales')
+
+
+def test_replay_after_torn_tail(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    import ms
+    path = os.path.join(tmp_path, "data", "ledger.db")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    store = ms.LedgerStore(path, commit_delay=3600)
+    store.append_rows('sales', sale(ms, '2024-01-01', 1.0))
+    store.flush()
+    db_id = store.db_id
+    crash(store)
+    with open(os.path.join(tmp_path, "data", "journal.wal"), 'a') as f:
+        f.write('{"db": "%s", "seq": 99, "op": "app' % db_id)
+
+    store = ms.LedgerStore(path, commit_delay=3600)
+    store.replay_journal()
+    store.append_rows('sales', sale(ms, '2024-01-02', 2.0))
+    crash(store)
+
+    store = ms.LedgerStore(path, commit_delay=3600)
+    assert store.replay_journal() == 1
+    assert store.read_table('sales')['Amount'].tolist() == [1.0, 2.0]
+    store.close()
+
+
+def test_failing_write_is_set_aside(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    import ms
+    path = os.path.join(tmp_path, "data", "ledger.db")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    store = ms.LedgerStore(path, commit_delay=3600)
+    store.on_error = lambda message: None
+    with store.unit_of_work():
+        store.enqueue('sales', 'update_value', 'sales', 'Type', 'x', 'Amount', 1.0)
+        store.append_rows('sales', sale(ms, '2024-01-01', 1.0))
+    store.flush()
+    store.append_rows('sales', sale(ms, '2024-01-02', 2.0))
+    store.flush()
+    assert store.pending_count() == 0
+    assert store.read_table('sales')['Amount'].tolist() == [1.0, 2.0]
+    with open(store.journal_path + ".failed") as f:
+        assert [line.count('"update_value"') for line in f] == [1]
+    store.close()